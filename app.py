@@ -1,13 +1,36 @@
 import os
-import io
+import hmac
 import json
-import pandas as pd
+import mimetypes
+import tempfile
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from functools import wraps
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, abort
+import click
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, abort, Response, \
+    session, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.local import LocalProxy
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
+
+import assets
+import calc_engine
+import compression
+import events
+import export_jobs
+import exports
+import forecast
+import metrics
+import migrations
+import qr_store
+import storage
+import subscriptions
 
 # =============================================================================
 # CONFIGURATION & PATHS
@@ -21,44 +44,46 @@ BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 TEMPLATE_DIR = os.path.join(BASE_DIR, 'templates')
 STATIC_DIR = os.path.join(BASE_DIR, 'static')
 UPLOAD_FOLDER = os.path.join(STATIC_DIR, 'uploads')
-DB_PATH = os.path.join(BASE_DIR, 'production_v30_secure.db')
+DB_PATH = os.environ.get('CAWIRE_DB_PATH', os.path.join(BASE_DIR, 'production_v30_secure.db'))
 
 
 # =============================================================================
 # 1. TEMPLATES (Automatic Generation)
 # =============================================================================
+def write_template_if_changed(name, source):
+    # Every worker runs this at import. Rewriting unchanged files bumps their mtime, which makes
+    # Jinja drop its compiled cache (and lets a reloading worker read a half-written file), so a
+    # template is only written when its content differs, via a temp file + atomic rename.
+    path = os.path.join(TEMPLATE_DIR, name)
+    data = source.encode('utf-8')
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data: return False
+    except FileNotFoundError:
+        pass
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
 def setup_directories_and_templates():
     if not os.path.exists(TEMPLATE_DIR): os.makedirs(TEMPLATE_DIR)
     if not os.path.exists(STATIC_DIR): os.makedirs(STATIC_DIR)
     if not os.path.exists(UPLOAD_FOLDER): os.makedirs(UPLOAD_FOLDER)
 
     # --- BASE.HTML ---
-    with open(os.path.join(TEMPLATE_DIR, 'base.html'), 'w', encoding='utf-8') as f:
-        f.write('''
+    write_template_if_changed('base.html', '''
 <!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Ca-Wire Automation</title>
-    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
-    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
-    <style>
-        body { background-color: #f3f5f9; font-family: 'Segoe UI', sans-serif; color: #2c3e50; }
-        .card { border: none; border-radius: 16px; box-shadow: 0 8px 30px rgba(0,0,0,0.05); }
-
-        /* User Theme */
-        .user-nav { background: linear-gradient(135deg, #0f2027 0%, #203a43 50%, #2c5364 100%); }
-        .btn-primary-custom { background-image: linear-gradient(135deg, #0f2027 0%, #2c5364 100%); border: none; color: white; padding: 12px; border-radius: 8px; }
-
-        /* Admin Theme */
-        .admin-nav { background: #212529; border-bottom: 1px solid #495057; }
-
-        /* Gradients */
-        .grad-heat { background: linear-gradient(135deg, #FF512F 0%, #DD2476 100%); color: white; }
-        .grad-chem { background: linear-gradient(135deg, #4776E6 0%, #8E54E9 100%); color: white; }
-        .grad-dark { background: linear-gradient(135deg, #232526 0%, #414345 100%); color: white; }
-    </style>
+    <link href="{{ asset_url('vendor/bootstrap-5.3.0/css/bootstrap.min.css') }}" rel="stylesheet">
+    <link rel="stylesheet" href="{{ asset_url('vendor/fontawesome-6.4.0/css/all.min.css') }}">
+    <link rel="stylesheet" href="{{ url_for('static', filename='css/app.css') }}">
 </head>
 <body>
     {% if current_user.is_authenticated %}
@@ -71,6 +96,9 @@ def setup_directories_and_templates():
                 </a>
                 <div class="collapse navbar-collapse">
                     <div class="navbar-nav ms-auto gap-3">
+                        {% if pending_count %}
+                        <a class="nav-link text-warning" href="/admin"><i class="fa-solid fa-bell me-1"></i> Pending <span class="badge bg-danger rounded-pill">{{ pending_count }}</span></a>
+                        {% endif %}
                         <span class="nav-item nav-link text-white-50"><small>SECURE SESSION</small></span>
                         <a class="nav-link text-white fw-bold" href="/logout"><i class="fa-solid fa-power-off me-1"></i> Terminate</a>
                     </div>
@@ -87,6 +115,7 @@ def setup_directories_and_templates():
                         <a class="nav-link text-white" href="{{ url_for('operator_dashboard') }}">Dashboard</a>
                         <a class="nav-link text-white" href="{{ url_for('settings') }}">Settings</a>
                         <a class="nav-link text-white" href="/history">History</a>
+                        <a class="nav-link text-white" href="{{ url_for('analytics') }}">Analytics</a>
                         <a class="nav-link text-warning" href="/subscription">Subscription</a>
                         <a class="nav-link text-white" href="/logout">Logout</a>
                     </div>
@@ -106,23 +135,23 @@ def setup_directories_and_templates():
         {% endwith %}
         {% block content %}{% endblock %}
     </div>
-    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
+    <script src="{{ asset_url('vendor/popper-2.11.8/umd/popper.min.js') }}"></script>
+    <script src="{{ asset_url('vendor/bootstrap-5.3.0/js/bootstrap.min.js') }}"></script>
     {% block scripts %}{% endblock %}
 </body>
 </html>
         ''')
 
     # --- ADMIN LOGIN.HTML (NEW SEPARATE LOGIN) ---
-    with open(os.path.join(TEMPLATE_DIR, 'admin_login.html'), 'w', encoding='utf-8') as f:
-        f.write('''
+    write_template_if_changed('admin_login.html', '''
 <!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Restricted Access</title>
-    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
-    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
+    <link href="{{ asset_url('vendor/bootstrap-5.3.0/css/bootstrap.min.css') }}" rel="stylesheet">
+    <link rel="stylesheet" href="{{ asset_url('vendor/fontawesome-6.4.0/css/all.min.css') }}">
     <style>
         body { background-color: #121212; color: #e0e0e0; height: 100vh; display: flex; align-items: center; justify-content: center; font-family: 'Courier New', monospace; }
         .login-box { width: 100%; max-width: 400px; padding: 40px; background: #1e1e1e; border: 1px solid #333; border-radius: 8px; box-shadow: 0 0 20px rgba(0,0,0,0.5); }
@@ -169,8 +198,7 @@ def setup_directories_and_templates():
         ''')
 
     # --- ADMIN DASHBOARD (CLEAN ENTERPRISE LAYOUT) ---
-    with open(os.path.join(TEMPLATE_DIR, 'admin.html'), 'w', encoding='utf-8') as f:
-        f.write('''
+    write_template_if_changed('admin.html', '''
 {% extends "base.html" %}
 {% block content %}
 <style>
@@ -203,12 +231,31 @@ def setup_directories_and_templates():
     <div class="col-lg-8">
         <div class="card-clean h-100">
             <div class="card-header-clean d-flex justify-content-between align-items-center">
-                <h5 class="fw-bold m-0 text-dark">User Directory <span class="text-muted fw-normal ms-2 fs-6">({{ all_users|length }} total)</span></h5>
+                <h5 class="fw-bold m-0 text-dark">User Directory <span class="text-muted fw-normal ms-2 fs-6">({{ total }} {{ 'matching' if filters else 'total' }})</span></h5>
                 <div class="d-flex gap-2">
-                    <button class="btn btn-sm btn-outline-secondary"><i class="fa-solid fa-filter me-1"></i> Filter</button>
-                    <button class="btn btn-sm btn-outline-primary"><i class="fa-solid fa-download me-1"></i> Export</button>
+                    <button class="btn btn-sm btn-outline-secondary" type="button" data-bs-toggle="collapse" data-bs-target="#userFilters"><i class="fa-solid fa-filter me-1"></i> Filter</button>
+                    <a href="{{ url_for('admin_users_export', **filters) }}" class="btn btn-sm btn-outline-primary"><i class="fa-solid fa-download me-1"></i> Export</a>
                 </div>
             </div>
+            <form method="GET" id="userFilters" class="collapse {{ 'show' if filters }} row g-2 px-4 py-3 border-bottom bg-light mx-0">
+                <div class="col-md-5"><input type="text" name="q" class="form-control form-control-sm" placeholder="Search username" value="{{ filters.q }}"></div>
+                <div class="col-md-2">
+                    <select name="role" class="form-select form-select-sm">
+                        <option value="">Any role</option>
+                        {% for r in ('operator', 'admin') %}<option value="{{ r }}" {{ 'selected' if filters.role == r }}>{{ r|capitalize }}</option>{% endfor %}
+                    </select>
+                </div>
+                <div class="col-md-2">
+                    <select name="status" class="form-select form-select-sm">
+                        <option value="">Any status</option>
+                        {% for s in ('active', 'expiring', 'expired', 'permanent') %}<option value="{{ s }}" {{ 'selected' if filters.status == s }}>{{ s|capitalize }}</option>{% endfor %}
+                    </select>
+                </div>
+                <div class="col-md-3 d-flex gap-2">
+                    <button type="submit" class="btn btn-dark btn-sm flex-fill">Apply</button>
+                    <a href="{{ url_for('admin_panel') }}" class="btn btn-outline-secondary btn-sm">Reset</a>
+                </div>
+            </form>
             <div class="table-responsive">
                 <table class="table align-middle mb-0 table-hover">
                     <thead class="bg-light text-secondary small">
@@ -220,7 +267,7 @@ def setup_directories_and_templates():
                         </tr>
                     </thead>
                     <tbody class="border-top-0">
-                        {% for user in all_users %}
+                        {% for user in users %}
                         <tr>
                             <td class="ps-4 py-3">
                                 <div class="d-flex align-items-center">
@@ -241,8 +288,10 @@ def setup_directories_and_templates():
                             <td>
                                 {% if user.role == 'admin' %}
                                     <span class="text-dark fw-bold small"><span class="status-dot dot-success"></span>Permanent</span>
-                                {% elif user.subscription_expiry and user.subscription_expiry > now %}
+                                {% elif user.subscription_status == 'active' %}
                                     <span class="text-success fw-bold small"><span class="status-dot dot-success"></span>Active</span>
+                                {% elif user.subscription_status == 'expiring' %}
+                                    <span class="text-warning fw-bold small"><span class="status-dot dot-warning"></span>Expiring</span>
                                 {% else %}
                                     <span class="text-danger fw-bold small"><span class="status-dot dot-danger"></span>Expired</span>
                                 {% endif %}
@@ -251,10 +300,18 @@ def setup_directories_and_templates():
                                 {{ user.subscription_expiry.strftime('%Y-%m-%d') if user.subscription_expiry else '--' }}
                             </td>
                         </tr>
+                        {% else %}
+                        <tr><td colspan="4" class="text-center text-muted py-4">No users match.</td></tr>
                         {% endfor %}
                     </tbody>
                 </table>
             </div>
+            {% if prev_page or next_page %}
+            <div class="d-flex justify-content-between px-4 py-3 border-top">
+                {% if prev_page %}<a href="{{ url_for('admin_panel', before=prev_page, **filters) }}" class="btn btn-outline-secondary btn-sm">&larr; Previous</a>{% else %}<span></span>{% endif %}
+                {% if next_page %}<a href="{{ url_for('admin_panel', after=next_page, **filters) }}" class="btn btn-outline-secondary btn-sm">Next &rarr;</a>{% endif %}
+            </div>
+            {% endif %}
         </div>
     </div>
 
@@ -263,12 +320,18 @@ def setup_directories_and_templates():
 
         <!-- PENDING APPROVALS SECTION -->
         <div class="mb-4">
-            <h6 class="fw-bold text-muted text-uppercase small mb-3">Action Queue <span class="badge bg-danger rounded-pill ms-1">{{ pending_users|length }}</span></h6>
+            <h6 class="fw-bold text-muted text-uppercase small mb-3">Action Queue <span class="badge bg-danger rounded-pill ms-1" id="queueCount">{{ pending_users|length }}</span></h6>
             {% if pending_users %}
+                <div class="card-clean p-2 mb-3 d-flex align-items-center gap-2" id="bulkBar">
+                    <input class="form-check-input ms-1 mt-0" type="checkbox" id="selectAll" onchange="document.querySelectorAll('.bulk-select').forEach(c => c.checked = this.checked)">
+                    <label class="small text-muted me-auto" for="selectAll">Select all</label>
+                    <button type="button" class="btn btn-primary btn-sm" onclick="bulkPayments('approve')">Approve selected</button>
+                    <button type="button" class="btn btn-outline-danger btn-sm" onclick="bulkPayments('reject')">Deny selected</button>
+                </div>
                 {% for p_user in pending_users %}
-                <div class="card-clean task-card p-3 mb-3">
+                <div class="card-clean task-card p-3 mb-3" id="task-{{ p_user.id }}">
                     <div class="d-flex justify-content-between mb-2">
-                        <span class="fw-bold text-dark">{{ p_user.username }}</span>
+                        <label class="fw-bold text-dark"><input class="form-check-input bulk-select me-2" type="checkbox" value="{{ p_user.id }}">{{ p_user.username }}</label>
                         <span class="badge bg-warning text-dark">Pending</span>
                     </div>
                     <div class="bg-light p-2 rounded mb-3 small">
@@ -299,12 +362,30 @@ def setup_directories_and_templates():
             {% endif %}
         </div>
 
+        <!-- UPCOMING EXPIRIES -->
+        {% if expiring %}
+        <div class="mb-4">
+            <h6 class="fw-bold text-muted text-uppercase small mb-3">Expiring Soon</h6>
+            <div class="card-clean p-3">
+                {% for e_user in expiring %}
+                <div class="d-flex justify-content-between small {{ 'mb-2' if not loop.last }}">
+                    <span class="fw-bold text-dark"><span class="status-dot dot-warning"></span>{{ e_user.username }}</span>
+                    <span class="text-muted font-monospace">{{ e_user.subscription_expiry.strftime('%Y-%m-%d') }}</span>
+                </div>
+                {% endfor %}
+                <a href="{{ url_for('admin_panel', status='expiring') }}" class="small d-block mt-2">View all</a>
+            </div>
+        </div>
+        {% endif %}
+
         <!-- QR CONFIG SECTION -->
         <div>
             <h6 class="fw-bold text-muted text-uppercase small mb-3">System Configuration</h6>
             <div class="card-clean p-4">
                 <div class="text-center mb-3">
-                    <img src="{{ url_for('static', filename='uploads/upi_qr.png') }}?v={{ now.timestamp() }}" class="img-fluid rounded border p-1" style="width: 120px; height: 120px; object-fit: contain;">
+                    {% set qr_url = payment_qr_url() %}
+                    {% if qr_url %}<img src="{{ qr_url }}" class="img-fluid rounded border p-1" style="width: 120px; height: 120px; object-fit: contain;">
+                    {% else %}<div class="small text-muted border rounded p-4">No QR uploaded</div>{% endif %}
                     <div class="small text-muted mt-2">Active Payment QR</div>
                 </div>
                 <form action="{{ url_for('admin_upload_qr') }}" method="POST" enctype="multipart/form-data">
@@ -317,12 +398,28 @@ def setup_directories_and_templates():
 
     </div>
 </div>
+{% endblock %}
+
+{% block scripts %}
+<script>
+    function bulkPayments(action) {
+        const ids = Array.from(document.querySelectorAll('.bulk-select:checked')).map(c => parseInt(c.value));
+        if (!ids.length) return;
+        if (action === 'reject' && !confirm('Deny ' + ids.length + ' payment(s)?')) return;
+        fetch('{{ url_for("admin_bulk_payments") }}', { method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({action: action, user_ids: ids}) })
+        .then(res => res.json()).then(data => {
+            if (!data.success) { alert(data.error); return; }
+            data.updated.concat(data.skipped).forEach(id => { const card = document.getElementById('task-' + id); if (card) card.remove(); });
+            document.getElementById('queueCount').innerText = document.querySelectorAll('.bulk-select').length;
+            document.getElementById('selectAll').checked = false;
+        });
+    }
+</script>
 {% endblock %}
         ''')
 
     # --- SUBSCRIPTION.HTML ---
-    with open(os.path.join(TEMPLATE_DIR, 'subscription.html'), 'w', encoding='utf-8') as f:
-        f.write('''
+    write_template_if_changed('subscription.html', '''
 {% extends "base.html" %} 
 {% block content %} 
 <div class="row justify-content-center"> 
@@ -365,9 +462,9 @@ def setup_directories_and_templates():
                         <div class="card bg-light border-0 rounded-4 text-start p-4 mt-3">
                             <h6 class="fw-bold text-uppercase text-secondary mb-3 small ls-1">Step 1: Scan & Pay</h6>
                             <div class="text-center bg-white p-3 rounded mb-3 border">
-                                <img src="{{ url_for('static', filename='uploads/upi_qr.png') }}?v={{ now.timestamp() }}" 
-                                     class="img-fluid" style="max-height: 200px;" 
-                                     alt="Admin has not uploaded a QR code yet">
+                                {% set qr_url = payment_qr_url() %}
+                                {% if qr_url %}<img src="{{ qr_url }}" class="img-fluid" style="max-height: 200px;" alt="Payment QR">
+                                {% else %}<p class="text-muted small m-0">Admin has not uploaded a QR code yet</p>{% endif %}
                                 <p class="small text-muted mt-2">Scan with PhonePe / GPay / Paytm</p>
                             </div>
 
@@ -392,8 +489,7 @@ def setup_directories_and_templates():
         ''')
 
     # --- OPERATOR_DASHBOARD.HTML ---
-    with open(os.path.join(TEMPLATE_DIR, 'operator_dashboard.html'), 'w', encoding='utf-8') as f:
-        f.write('''
+    write_template_if_changed('operator_dashboard.html', '''
 {% extends "base.html" %} 
 {% block content %}
 <style>
@@ -419,7 +515,7 @@ def setup_directories_and_templates():
                 <div class="card-body p-4">
                     <div class="row g-3">
                         <div class="col-md-6"><div class="form-floating"><input type="text" class="form-control fw-bold" id="heat_id" name="heat_id" required><label>Heat ID</label></div></div>
-                        <div class="col-md-6"><div class="form-floating"><input type="text" class="form-control" id="lf_number" name="lf_number" required><label>LF Number</label></div></div>
+                        <div class="col-md-6"><div class="form-floating"><input type="text" class="form-control" id="lf_number" name="lf_number" value="{{ lf }}" required><label>LF Number</label></div></div>
                         <div class="col-md-4"><div class="form-floating"><input type="number" step="0.1" class="form-control" id="tonnage" name="tonnage" value="150" required><label>Tonnage</label></div></div>
                         <div class="col-md-4"><div class="form-floating"><input type="number" class="form-control" id="temp" name="temp" value="1580" required><label>Temp (°C)</label></div></div>
                         <div class="col-md-4"><div class="form-floating"><input type="number" class="form-control" id="freeboard" name="freeboard" value="400"><label>Freeboard</label></div></div>
@@ -435,7 +531,7 @@ def setup_directories_and_templates():
                         <div class="col-md-4"><label class="small fw-bold text-muted">Si%</label><input type="number" step="0.001" class="form-control" id="si" name="si_pct" value="0.200"></div>
                         <div class="col-md-6"><label class="small fw-bold text-muted">Initial P%</label><input type="number" step="0.001" class="form-control" id="p_initial" name="p_initial" value="0.012"></div>
                         <div class="col-md-6"><label class="small fw-bold text-muted">Current P%</label><input type="number" step="0.001" class="form-control" id="p_before" name="p_before" value="0.015"></div>
-                        <input type="hidden" id="speed" value="120">
+                        <input type="hidden" id="speed" name="speed" value="120">
                         <input type="hidden" id="calculated_length_hidden" name="calculated_length_hidden" value="0">
                     </div>
                 </div>
@@ -446,10 +542,14 @@ def setup_directories_and_templates():
     <div class="col-lg-4">
         <div class="card border-0 shadow-sm mb-4 grad-dark">
             <div class="card-body p-4">
-                <div class="d-flex justify-content-between mb-2"><span class="text-white-50 small">ACTIVE COIL</span><span class="badge bg-light text-dark">{{ coil.coil_number }}</span></div>
-                <h2 class="fw-bold mb-3">{{ "%.0f"|format(coil.current_length) }} <span class="fs-6 text-white-50">m left</span></h2>
+                <div class="d-flex justify-content-between mb-2"><span class="text-white-50 small">ACTIVE COIL{% if coil.lf_number %} &middot; LF {{ coil.lf_number }}{% endif %}</span><span class="badge bg-light text-dark">{{ coil.coil_number }}</span></div>
+                <h2 class="fw-bold mb-3"><span id="coilLength">{{ "%.0f"|format(coil.current_length) }}</span> <span class="fs-6 text-white-50">m left</span></h2>
                 {% set pct = (coil.current_length / coil.total_length * 100) if coil.total_length > 0 else 0 %}
-                <div class="progress" style="height: 6px; background: rgba(255,255,255,0.1);"><div class="progress-bar bg-success" style="width: {{ pct }}%"></div></div>
+                <div class="progress" style="height: 6px; background: rgba(255,255,255,0.1);"><div id="coilBar" class="progress-bar bg-success" style="width: {{ pct }}%"></div></div>
+                <div class="d-flex justify-content-between mt-2 small text-white-50">
+                    <span><i class="fa-solid fa-fire me-1"></i><span id="fcHeats">{{ forecast.heats_remaining if forecast.heats_remaining is not none else '-' }}</span> heats left</span>
+                    <span><i class="fa-regular fa-clock me-1"></i>empty <span id="fcEmpty">{% if not forecast.empty_at %}-{% elif forecast.empty_at[:10] == now.strftime('%Y-%m-%d') %}{{ forecast.empty_at[11:] }}{% else %}{{ forecast.empty_at.replace('T', ' ') }}{% endif %}</span></span>
+                </div>
             </div>
         </div>
         <div class="card h-100 border-0 shadow-lg text-white" style="background: linear-gradient(180deg, #2C3E50 0%, #000000 100%);">
@@ -471,10 +571,38 @@ def setup_directories_and_templates():
 
 {% block scripts %}
 <script>
+    function emptyLabel(iso) {
+        // time only when the coil runs out today, else date and time
+        if (!iso) return '-';
+        const d = new Date(), pad = n => String(n).padStart(2, '0');
+        const today = `${d.getFullYear()}-${pad(d.getMonth() + 1)}-${pad(d.getDate())}`;
+        return iso.slice(0, 10) === today ? iso.slice(11) : iso.replace('T', ' ');
+    }
+    function refreshForecast() {
+        fetch('{{ url_for("coil_forecast_api") }}').then(res => res.json()).then(f => {
+            document.getElementById('fcHeats').innerText = f.heats_remaining ?? '-';
+            document.getElementById('fcEmpty').innerText = emptyLabel(f.empty_at);
+        });
+    }
+    // live balance: another LF (or this one, in another tab) injecting from this coil updates it in place
+    const coilId = {{ coil.id }}, lfs = [{{ lf|tojson }}, {{ coil.lf_number|tojson }}];
+    const liveEvents = new EventSource('{{ url_for("event_stream") }}');
+    liveEvents.addEventListener('coil', e => {
+        const c = JSON.parse(e.data);
+        if(c.coil_id !== coilId) return;
+        document.getElementById('coilLength').innerText = Math.round(c.current_length);
+        document.getElementById('coilBar').style.width = (c.total_length > 0 ? c.current_length / c.total_length * 100 : 0) + '%';
+        refreshForecast();
+    });
+    liveEvents.addEventListener('coil_config', e => {
+        const c = JSON.parse(e.data);
+        if(c.coil_id === coilId || lfs.includes(c.lf_number)) window.location.reload();  // this LF's coil changed
+    });
     function predictLength() {
         const btn = document.querySelector('button[onclick="predictLength()"]');
         btn.innerHTML = 'Processing...';
         const data = {
+            lf_number: document.getElementById('lf_number').value,
             tonnage: document.getElementById('tonnage').value, freeboard: document.getElementById('freeboard').value,
             speed: document.getElementById('speed').value, temp: document.getElementById('temp').value,
             al: document.getElementById('al').value, s: document.getElementById('s').value,
@@ -497,8 +625,7 @@ def setup_directories_and_templates():
         ''')
 
     # --- LOGIN.HTML (USER ONLY) ---
-    with open(os.path.join(TEMPLATE_DIR, 'login.html'), 'w', encoding='utf-8') as f:
-        f.write('''
+    write_template_if_changed('login.html', '''
 {% extends "base.html" %} 
 {% block content %} 
 <div class="row justify-content-center mt-5"> 
@@ -520,8 +647,7 @@ def setup_directories_and_templates():
 {% endblock %}
         ''')
 
-    with open(os.path.join(TEMPLATE_DIR, 'signup.html'), 'w', encoding='utf-8') as f:
-        f.write('''
+    write_template_if_changed('signup.html', '''
 {% extends "base.html" %} 
 {% block content %} 
 <div class="row justify-content-center mt-5"> 
@@ -542,40 +668,92 @@ def setup_directories_and_templates():
 {% endblock %}
         ''')
 
-    with open(os.path.join(TEMPLATE_DIR, 'history.html'), 'w', encoding='utf-8') as f:
-        f.write('''
+    write_template_if_changed('history.html', '''
 {% extends "base.html" %} 
 {% block content %} 
 <div class="card shadow-sm"> 
     <div class="card-header bg-white d-flex justify-content-between align-items-center py-3"> 
         <h5 class="m-0 fw-bold">Injection Logs</h5> 
         <div class="d-flex gap-2"> 
-            <a href="{{ url_for('export_data') }}" class="btn btn-success btn-sm">Export Excel</a> 
+            <span id="exportStatus" class="small text-muted align-self-center"></span> 
+            <a href="{{ url_for('export_data', **filters) }}" onclick="return startExport('xlsx', this)" class="btn btn-success btn-sm">Export Excel</a> 
+            <a href="{{ url_for('export_data', format='csv', **filters) }}" onclick="return startExport('csv', this)" class="btn btn-outline-success btn-sm">CSV</a> 
             <form action="{{ url_for('delete_history') }}" method="POST" onsubmit="return confirm('Delete all logs?');"> 
                 <button type="submit" class="btn btn-outline-danger btn-sm">Clear</button> 
             </form> 
         </div> 
     </div> 
+    <form method="GET" class="row g-2 px-3 py-3 border-bottom bg-light mx-0"> 
+        <div class="col-md-2"><input type="text" name="lf" class="form-control form-control-sm" placeholder="LF" value="{{ filters.lf }}"></div> 
+        <div class="col-md-2"><input type="text" name="coil" class="form-control form-control-sm" placeholder="Coil" value="{{ filters.coil }}"></div> 
+        <div class="col-md-2"><input type="text" name="heat" class="form-control form-control-sm" placeholder="Heat ID" value="{{ filters.heat }}"></div> 
+        <div class="col-md-2"><input type="date" name="start" class="form-control form-control-sm" value="{{ filters.start }}"></div> 
+        <div class="col-md-2"><input type="date" name="end" class="form-control form-control-sm" value="{{ filters.end }}"></div> 
+        <div class="col-md-2 d-flex gap-2"> 
+            <button type="submit" class="btn btn-dark btn-sm flex-fill">Filter</button> 
+            <a href="{{ url_for('history') }}" class="btn btn-outline-secondary btn-sm">Reset</a> 
+        </div> 
+    </form> 
     <div class="card-body p-0"> 
         <div class="table-responsive"> 
             <table class="table table-hover align-middle mb-0"> 
                 <thead class="bg-light"> <tr> <th class="ps-4">Time</th> <th>Heat ID</th> <th>LF</th> <th>Coil</th> <th>Tonnage</th> <th>Used (m)</th> </tr> </thead> 
-                <tbody> 
+                <tbody id="logRows"> 
                     {% for log in logs %} 
                     <tr> <td class="ps-4">{{ log.timestamp.strftime('%m-%d %H:%M') }}</td> <td>{{ log.heat_id }}</td> <td>{{ log.lf_number }}</td> <td>{{ log.coil_number }}</td> <td>{{ log.heat_tonnage }}</td> <td>{{ "%.1f"|format(log.calculated_length) }}</td> </tr> 
                     {% else %} 
-                    <tr><td colspan="6" class="text-center py-3">No history.</td></tr> 
+                    <tr id="noLogs"><td colspan="6" class="text-center py-3">No history.</td></tr> 
                     {% endfor %} 
                 </tbody> 
             </table> 
         </div> 
     </div> 
+    <div class="card-footer bg-white d-flex justify-content-between py-3"> 
+        {% if newer %}<a href="{{ url_for('history', after=newer, **filters) }}" class="btn btn-outline-secondary btn-sm">&larr; Newer</a>{% else %}<span></span>{% endif %} 
+        {% if older %}<a href="{{ url_for('history', before=older, **filters) }}" class="btn btn-outline-secondary btn-sm">Older &rarr;</a>{% endif %} 
+    </div> 
 </div> 
+{% endblock %}
+
+{% block scripts %}
+<script>
+    {% if not newer and not filters and current_user.has_active_subscription() %}
+    // newest page, unfiltered: new injections from any LF are added at the top as they happen
+    const liveEvents = new EventSource('{{ url_for("event_stream") }}');
+    liveEvents.addEventListener('injection', e => {
+        const log = JSON.parse(e.data);
+        const row = document.createElement('tr');
+        [log.timestamp.slice(5, 16).replace('T', ' '), log.heat_id, log.lf_number, log.coil_number, log.heat_tonnage,
+         log.calculated_length.toFixed(1)].forEach((v, i) => {
+            const td = row.insertCell(); td.innerText = v ?? ''; if(i === 0) td.className = 'ps-4';
+        });
+        document.getElementById('noLogs')?.remove();
+        document.getElementById('logRows').prepend(row);
+    });
+    liveEvents.addEventListener('history_cleared', () => window.location.reload());
+    {% endif %}
+    // Queues the export, shows progress, then downloads the finished file. Without JS the links hit /export_data.
+    function startExport(format, link) {
+        const status = document.getElementById('exportStatus');
+        const body = Object.assign({format: format}, {{ filters|tojson }});
+        status.innerText = 'Queued...';
+        fetch('{{ url_for("create_export_job") }}', { method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify(body) })
+        .then(res => res.json()).then(job => {
+            if(!job.success) { status.innerText = job.error; return; }
+            const poll = () => fetch(job.status_url).then(res => res.json()).then(j => {
+                if(j.status === 'done') { status.innerText = ''; window.location.href = job.download_url; }
+                else if(j.status === 'failed') { status.innerText = 'Export failed: ' + j.error; }
+                else { status.innerText = 'Exporting ' + Math.round(j.progress * 100) + '%'; setTimeout(poll, 1000); }
+            });
+            poll();
+        }).catch(() => { window.location.href = link.href; });
+        return false;
+    }
+</script>
 {% endblock %}
         ''')
 
-    with open(os.path.join(TEMPLATE_DIR, 'settings.html'), 'w', encoding='utf-8') as f:
-        f.write('''
+    write_template_if_changed('settings.html', '''
 {% extends "base.html" %} 
 {% block content %} 
 <div class="row justify-content-center"> 
@@ -587,7 +765,7 @@ def setup_directories_and_templates():
         <div class="card shadow-lg border-0 overflow-hidden"> 
             <div class="card-header grad-dark text-white p-4"> 
                 <div class="d-flex justify-content-between align-items-center"> 
-                    <span>Active Coil: <strong>{{ coil.coil_number }}</strong></span> 
+                    <span>Active Coil{% if lf %} for LF {{ lf }}{% endif %}: <strong>{{ coil.coil_number }}</strong></span> 
                     <i class="fa-solid fa-sliders"></i> 
                 </div> 
             </div> 
@@ -600,6 +778,10 @@ def setup_directories_and_templates():
                             <input type="text" class="form-control fw-bold" name="coil_number" value="{{ coil.coil_number }}"> 
                         </div> 
                     </div> 
+                    <div class="mb-4"> 
+                        <label class="form-label text-uppercase small fw-bold text-muted">LF Number</label> 
+                        <input type="text" class="form-control" name="lf_number" value="{{ lf }}" placeholder="blank = plant default for LFs without their own coil"> 
+                    </div> 
                     <div class="row g-3"> 
                         <div class="col-md-6"> <label class="form-label text-muted small fw-bold">Total Length (m)</label> <input type="number" class="form-control" name="total_length" value="{{ coil.total_length }}"> </div> 
                         <div class="col-md-6"> <label class="form-label text-muted small fw-bold">Density (g/m)</label> <input type="number" step="0.1" class="form-control" name="density" value="{{ coil.density }}"> </div> 
@@ -611,8 +793,57 @@ def setup_directories_and_templates():
                 </form> 
             </div> 
         </div> 
+        <div class="card shadow-sm border-0 mt-4"> 
+            <div class="card-header bg-white py-3"><h6 class="m-0 fw-bold">Active Coils by LF</h6></div> 
+            <ul class="list-group list-group-flush"> 
+                {% for c in active_coils %} 
+                <li class="list-group-item d-flex justify-content-between"> 
+                    <a href="{{ url_for('settings', lf=c.lf_number) }}">{{ 'LF ' ~ c.lf_number if c.lf_number else 'Plant default' }}</a> 
+                    <span><strong>{{ c.coil_number }}</strong> &middot; {{ "%.0f"|format(c.current_length) }} m left</span> 
+                </li> 
+                {% endfor %} 
+            </ul> 
+        </div> 
     </div> 
 </div> 
+{% endblock %}
+        ''')
+
+    write_template_if_changed('analytics.html', '''
+{% extends "base.html" %}
+{% macro rollup_table(title, rows, dims) %}
+<div class="card shadow-sm mb-4">
+    <div class="card-header bg-white py-3"><h6 class="m-0 fw-bold">{{ title }}</h6></div>
+    <div class="card-body p-0">
+        <div class="table-responsive">
+            <table class="table table-hover align-middle mb-0">
+                <thead class="bg-light"> <tr> {% for d in dims %}<th class="{{ 'ps-4' if loop.first }}">{{ d|upper if d in ('lf',) else d|capitalize }}</th>{% endfor %} <th>Heats</th> <th>Used (m)</th> <th>Tonnage</th> <th>m / Heat</th> <th>m / Tonne</th> </tr> </thead>
+                <tbody>
+                    {% for r in rows %}
+                    <tr> {% for d in dims %}<td class="{{ 'ps-4' if loop.first }}">{{ r[d] or '-' }}</td>{% endfor %} <td>{{ r.heats }}</td> <td>{{ "%.1f"|format(r.metres) }}</td> <td>{{ "%.1f"|format(r.tonnage) }}</td> <td>{{ "%.1f"|format(r.metres_per_heat) }}</td> <td>{{ "%.3f"|format(r.metres_per_tonne) }}</td> </tr>
+                    {% else %}
+                    <tr><td colspan="{{ dims|length + 5 }}" class="text-center py-3">No injections in this range.</td></tr>
+                    {% endfor %}
+                </tbody>
+            </table>
+        </div>
+    </div>
+</div>
+{% endmacro %}
+{% block content %}
+<div class="d-flex justify-content-between align-items-center mb-3">
+    <h4 class="fw-bold m-0">Consumption Analytics</h4>
+    <form method="GET" class="d-flex gap-2">
+        <input type="date" name="start" class="form-control form-control-sm" value="{{ start or '' }}">
+        <input type="date" name="end" class="form-control form-control-sm" value="{{ end or '' }}">
+        <button type="submit" class="btn btn-dark btn-sm">Apply</button>
+    </form>
+</div>
+<div class="row">
+    <div class="col-lg-6">{{ rollup_table('By Coil', by_coil, ['coil']) }}</div>
+    <div class="col-lg-6">{{ rollup_table('By LF', by_lf, ['lf']) }}</div>
+</div>
+{{ rollup_table('By Shift', by_shift, ['date', 'shift', 'lf']) }}
 {% endblock %}
         ''')
 
@@ -624,7 +855,12 @@ app.secret_key = SECRET_KEY
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{DB_PATH}'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = storage.engine_options()
+app.config['SQLITE_PRAGMAS'] = storage.pragmas_from_env()
 db = SQLAlchemy(app)
+with app.app_context():
+    storage.install_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
+
 login_manager = LoginManager()
 login_manager.init_app(app)
 # Default login view is for standard users
@@ -639,12 +875,21 @@ class User(UserMixin, db.Model):
     role = db.Column(db.String(50), default='operator')
     subscription_expiry = db.Column(db.DateTime, nullable=True)
     submitted_utr = db.Column(db.String(100), nullable=True)
+    # materialized by subscriptions.py: active / expiring / expired / permanent
+    subscription_status = db.Column(db.String(10), nullable=False, default='expired', server_default='expired')
+
+    __table_args__ = (
+        db.Index('ix_user_subscription_expiry', 'subscription_expiry'),
+        db.Index('ix_user_subscription_status', 'subscription_status', 'subscription_expiry'),
+    )
 
 
 class CoilConfig(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     coil_number = db.Column(db.String(50), default="C1")
     is_active = db.Column(db.Boolean, default=True)
+    # the ladle furnace this coil feeds; '' = plant default, used by any LF without its own coil
+    lf_number = db.Column(db.String(20), nullable=False, default='', server_default='')
     total_length = db.Column(db.Float, default=5000.0)
     current_length = db.Column(db.Float, default=5000.0)
     heats_treated = db.Column(db.Integer, default=0)
@@ -652,6 +897,16 @@ class CoilConfig(db.Model):
     target_ppm = db.Column(db.Float, default=30.0)
     recovery_target = db.Column(db.Float, default=20.0)
 
+    __table_args__ = (
+        db.Index('ix_coil_config_active_lf', 'is_active', 'lf_number'),
+    )
+
+
+class AppSetting(db.Model):
+    # Deployment-wide key/value settings, e.g. 'upi_qr' -> digest of the current payment QR
+    key = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.String(255))
+
 
 class InjectionLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -669,56 +924,557 @@ class InjectionLog(db.Model):
     p_before = db.Column(db.Float)
     p_initial_lf = db.Column(db.Float)
     temp = db.Column(db.Float)
+    # '<lf>/<heat_id>': a heat is confirmed once per LF, so a resent form can't deduct twice
+    confirm_key = db.Column(db.String(80))
+
+    # SQLite appends the rowid (id) to every index entry, so each of these also serves
+    # ORDER BY timestamp DESC, id DESC for the history keyset pagination.
+    __table_args__ = (
+        db.Index('ix_injection_log_timestamp', 'timestamp'),
+        db.Index('ix_injection_log_lf_timestamp', 'lf_number', 'timestamp'),
+        db.Index('ix_injection_log_coil_timestamp', 'coil_number', 'timestamp'),
+        db.Index('ix_injection_log_heat_id', 'heat_id'),
+        db.Index('uq_injection_log_confirm_key', 'confirm_key', unique=True),
+    )
+
+
+class ConsumptionRollup(db.Model):
+    # Per shift x LF x coil totals of InjectionLog, kept current by confirm_injection and
+    # rebuilt from the log by rebuild_rollups(). Missing LF / coil on old logs are stored as ''.
+    id = db.Column(db.Integer, primary_key=True)
+    shift_date = db.Column(db.Date, nullable=False)
+    shift = db.Column(db.String(1), nullable=False)
+    lf_number = db.Column(db.String(20), nullable=False, default='')
+    coil_number = db.Column(db.String(50), nullable=False, default='')
+    heats = db.Column(db.Integer, nullable=False, default=0)
+    metres = db.Column(db.Float, nullable=False, default=0.0)
+    tonnage = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        db.UniqueConstraint('shift_date', 'shift', 'lf_number', 'coil_number', name='uq_rollup_shift_lf_coil'),
+    )
+
+
+# --- IDENTITY CACHE ---
+# Flask-Login reloads the user on every request. Authorisation only needs a handful of fields,
+# so a snapshot of them is cached per user id; routes that change them call
+# identity_cache.invalidate(). Other workers pick up changes once the TTL lapses.
+IDENTITY_CACHE_SIZE = 1024
+IDENTITY_CACHE_TTL = 30
+
+
+class TTLCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize, self.ttl = maxsize, ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None: return None
+            if time.monotonic() - item[0] > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize: self._data.popitem(last=False)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None: self._data.clear()
+            else: self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SessionUser(UserMixin):
+    # Read-only stand-in for User as current_user. Load the User row to change anything.
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.role = user.role
+        self.subscription_expiry = user.subscription_expiry
+        self.submitted_utr = user.submitted_utr
+        self.subscription_status = user.subscription_status
+
+    def has_active_subscription(self):
+        # the stored status lags until the background refresh runs (never, with CAWIRE_STATUS_INTERVAL=0),
+        # so the cached expiry still cuts access off on time
+        if self.role == 'admin': return True
+        return (self.subscription_status in subscriptions.LIVE_STATUSES and self.subscription_expiry is not None
+                and self.subscription_expiry >= datetime.now())
+
+
+identity_cache = TTLCache(IDENTITY_CACHE_SIZE, IDENTITY_CACHE_TTL)
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    with metrics.span('load_user'):
+        identity = identity_cache.get(user_id)
+        if identity is None:
+            user = db.session.get(User, user_id)
+            if user is None: return None
+            identity = SessionUser(user)
+            identity_cache.set(user_id, identity)
+    return identity
+
+
+# --- ACTIVE COILS ---
+# Each LF has its own active coil, so furnaces deduct from different rows. The lf_number -> coil id
+# map is read once per process (ix_coil_config_active_lf) and reloaded only when a coil is rebound
+# (see COIL CONFIG VERSION); after that, finding a furnace's coil is a dict lookup plus a primary-key get.
+_active_coils = {'map': None}
+_active_coils_lock = threading.Lock()
+
+
+def lf_key(value):
+    return (value or '').strip()
+
+
+def current_lf(value=None):
+    # The LF a request is for: the one it names, else the last one this browser used.
+    lf = lf_key(value)
+    if lf and session.get('lf') != lf: session['lf'] = lf
+    return lf or session.get('lf', '')
+
+
+def active_coil_ids():
+    with _active_coils_lock:
+        if _active_coils['map'] is None:
+            rows = db.session.execute(db.select(CoilConfig.lf_number, CoilConfig.id)
+                                      .where(CoilConfig.is_active == True).order_by(CoilConfig.id)).all()
+            _active_coils['map'] = {lf or '': coil_id for lf, coil_id in rows}
+        return _active_coils['map']
+
+
+def invalidate_active_coils():
+    with _active_coils_lock:
+        _active_coils['map'] = None
+    calc_engine.invalidate()
+
+
+# --- COIL CONFIG VERSION ---
+# The lf -> coil map and the engines are per process, and only the worker that saved /settings drops
+# its own. Every change to coil settings therefore also stores a fresh token under COIL_VERSION_KEY,
+# in the same transaction; each worker compares it with the token its caches were built from at most every
+# COIL_VERSION_CHECK seconds (one primary-key read) and drops both when another process wrote.
+COIL_VERSION_KEY = 'coil_config_version'
+COIL_VERSION_CHECK = 1.0
+_coil_version = {'value': None, 'checked_at': None}
+_coil_version_lock = threading.Lock()
+
+
+def bump_coil_config_version():
+    # call inside the transaction that changes coil settings; the caller commits
+    db.session.merge(AppSetting(key=COIL_VERSION_KEY, value=os.urandom(8).hex()))
+
+
+def check_coil_config_version():
+    checked_at = _coil_version['checked_at']
+    if checked_at is not None and time.monotonic() - checked_at < COIL_VERSION_CHECK: return
+    with _coil_version_lock:
+        setting = db.session.get(AppSetting, COIL_VERSION_KEY)
+        version = setting.value if setting else None
+        if _coil_version['checked_at'] is not None and version != _coil_version['value']: invalidate_active_coils()
+        _coil_version['value'], _coil_version['checked_at'] = version, time.monotonic()
 
 
 # --- HELPERS ---
-def get_active_coil():
-    coil = CoilConfig.query.filter_by(is_active=True).first()
-    if not coil:
-        any_coil = CoilConfig.query.first()
-        if any_coil:
-            any_coil.is_active = True
-            coil = any_coil
-        else:
-            coil = CoilConfig(coil_number="COIL-001", is_active=True)
-            db.session.add(coil)
+def get_active_coil(lf=''):
+    check_coil_config_version()
+    ids = active_coil_ids()
+    coil_id = ids.get(lf_key(lf), ids.get(''))
+    coil = db.session.get(CoilConfig, coil_id) if coil_id else None
+    if coil is None:
+        # no coil for this LF and no plant default yet (fresh install): make one the default
+        coil = (CoilConfig.query.filter_by(lf_number='').order_by(CoilConfig.is_active.desc(), CoilConfig.id).first()
+                or CoilConfig(coil_number="COIL-001", lf_number=''))
+        coil.is_active = True
+        db.session.add(coil)
         db.session.commit()
+        # only the map: engines for other LFs are still right, and this one is being built from `coil`
+        with _active_coils_lock:
+            _active_coils['map'] = None
     return coil
 
 
+def get_engine(lf=''):
+    lf = lf_key(lf)
+    check_coil_config_version()
+    return calc_engine.get_engine(lambda: get_active_coil(lf), lf)
+
+
+def _recent_injections(coil_number, limit):
+    rows = db.session.execute(
+        db.select(InjectionLog.timestamp, InjectionLog.calculated_length)
+        .where(InjectionLog.coil_number == coil_number, InjectionLog.timestamp.isnot(None),
+               InjectionLog.calculated_length.isnot(None))
+        .order_by(InjectionLog.timestamp.desc()).limit(limit)).all()
+    return [tuple(r) for r in reversed(rows)]
+
+
+def coil_forecast(coil):
+    snap = forecast.get_forecast(coil, _recent_injections).snapshot(coil.current_length)
+    snap.update(coil_number=coil.coil_number, current_length=round(coil.current_length, 1),
+                total_length=coil.total_length, heats_treated=coil.heats_treated)
+    return snap
+
+
+# --- LOG QUERIES (shared by history and exports) ---
+EXPORT_HEADER = ('Time', 'Heat', 'Used')
+EXPORT_COLUMNS = (InjectionLog.timestamp, InjectionLog.heat_id, InjectionLog.calculated_length)
+LOG_CHUNK_SIZE = 2000
+
+
+def _parse_day(value, end=False):
+    # 'YYYY-MM-DD' covers the whole day; a full ISO timestamp is used as-is
+    dt = datetime.fromisoformat(value)
+    if end and len(value) <= 10: dt += timedelta(days=1)
+    return dt
+
+
+LOG_FILTER_KEYS = ('lf', 'coil', 'heat', 'start', 'end')
+HISTORY_PAGE_SIZE = 50
+
+
+def log_filters(args):
+    conditions = []
+    if args.get('lf'): conditions.append(InjectionLog.lf_number == args['lf'].strip())
+    if args.get('coil'): conditions.append(InjectionLog.coil_number == args['coil'].strip())
+    if args.get('heat'): conditions.append(InjectionLog.heat_id == args['heat'].strip())
+    if args.get('start'): conditions.append(InjectionLog.timestamp >= _parse_day(args['start']))
+    if args.get('end'): conditions.append(InjectionLog.timestamp < _parse_day(args['end'], end=True))
+    return conditions
+
+
+def iter_rows(model, columns, conditions, chunk_size=LOG_CHUNK_SIZE):
+    # Keyset pagination on the primary key: each chunk is its own short read on a pooled connection,
+    # so a long export neither holds a read lock against confirm_injection nor fills the ORM identity map.
+    last_id = 0
+    while True:
+        stmt = (db.select(model.id, *columns).where(model.id > last_id, *conditions)
+                .order_by(model.id).limit(chunk_size))
+        with db.engine.connect() as conn:
+            chunk = conn.execute(stmt).all()
+        if not chunk: return
+        for row in chunk:
+            yield tuple(row[1:])
+        last_id = chunk[-1][0]
+
+
+def iter_log_rows(columns, conditions, chunk_size=LOG_CHUNK_SIZE):
+    return iter_rows(InjectionLog, columns, conditions, chunk_size)
+
+
+def _log_cursor(log):
+    return f'{log.timestamp.isoformat()}_{log.id}'
+
+
+def _parse_log_cursor(value):
+    ts, _, log_id = value.rpartition('_')
+    return datetime.fromisoformat(ts), int(log_id)
+
+
+def fetch_log_page(conditions, before=None, after=None, size=HISTORY_PAGE_SIZE):
+    # Keyset pagination on (timestamp, id), newest first. Every page is an index range scan of
+    # size + 1 rows whatever its depth; the extra row only tells whether another page exists.
+    key = db.tuple_(InjectionLog.timestamp, InjectionLog.id)
+    q = InjectionLog.query.filter(*conditions)
+    if after:
+        logs = (q.filter(key > _parse_log_cursor(after))
+                .order_by(InjectionLog.timestamp, InjectionLog.id).limit(size + 1).all())
+        has_newer, logs = len(logs) > size, logs[:size][::-1]
+        return logs, (_log_cursor(logs[0]) if has_newer else None), (_log_cursor(logs[-1]) if logs else None)
+    if before: q = q.filter(key < _parse_log_cursor(before))
+    logs = q.order_by(InjectionLog.timestamp.desc(), InjectionLog.id.desc()).limit(size + 1).all()
+    has_older, logs = len(logs) > size, logs[:size]
+    return logs, (_log_cursor(logs[0]) if before and logs else None), (_log_cursor(logs[-1]) if has_older else None)
+
+
+# --- USER DIRECTORY (admin panel, JSON API and CSV export) ---
+USER_FILTER_KEYS = ('q', 'role', 'status')
+USER_PAGE_SIZE = 50
+USER_COLUMNS = (User.id, User.username, User.role, User.subscription_status, User.subscription_expiry,
+                User.submitted_utr)
+USER_EXPORT_HEADER = ('ID', 'Username', 'Role', 'Status', 'Expiry', 'Pending UTR')
+
+
+def user_filters(args):
+    # Legacy accounts can have a NULL role, which the app treats as operator.
+    conditions = []
+    if args.get('q'): conditions.append(User.username.contains(args['q'].strip(), autoescape=True))
+    if args.get('role'): conditions.append(db.func.coalesce(User.role, 'operator') == args['role'])
+    status = args.get('status')
+    if status:
+        if status not in subscriptions.STATUSES:
+            raise ValueError(f"status must be one of {', '.join(subscriptions.STATUSES)}")
+        conditions.append(User.subscription_status == status)
+    return conditions
+
+
+def upcoming_expiries(days=subscriptions.EXPIRING_SOON_DAYS, limit=None):
+    # Range scan of ix_user_subscription_expiry, soonest first
+    now = datetime.now()
+    q = (db.select(*USER_COLUMNS).where(User.subscription_expiry >= now,
+                                        User.subscription_expiry < now + timedelta(days=days),
+                                        User.subscription_status != 'permanent')
+         .order_by(User.subscription_expiry))
+    return db.session.execute(q.limit(limit) if limit else q).all()
+
+
+def fetch_user_page(conditions, before=None, after=None, size=USER_PAGE_SIZE):
+    # Keyset pagination on id, oldest account first; returns (rows, prev cursor, next cursor).
+    q = db.select(*USER_COLUMNS).where(*conditions)
+    if before:
+        rows = db.session.execute(q.where(User.id < int(before)).order_by(User.id.desc()).limit(size + 1)).all()
+        has_prev, rows = len(rows) > size, rows[:size][::-1]
+        return rows, (rows[0].id if has_prev else None), (rows[-1].id if rows else None)
+    if after: q = q.where(User.id > int(after))
+    rows = db.session.execute(q.order_by(User.id).limit(size + 1)).all()
+    has_next, rows = len(rows) > size, rows[:size]
+    return rows, (rows[0].id if after and rows else None), (rows[-1].id if has_next else None)
+
+
+def user_json(u):
+    return {'id': u.id, 'username': u.username, 'role': u.role or 'operator', 'status': u.subscription_status,
+            'subscription_expiry': u.subscription_expiry.isoformat() if u.subscription_expiry else None,
+            'submitted_utr': u.submitted_utr}
+
+
+def count_users(conditions):
+    return db.session.execute(db.select(db.func.count(User.id)).where(*conditions)).scalar()
+
+
 def subscription_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if not current_user.is_authenticated: return login_manager.unauthorized()
-        if current_user.role != 'admin':
-            if not current_user.subscription_expiry or current_user.subscription_expiry < datetime.now():
-                if request.path.startswith('/calculate_api'): return jsonify(
-                    {'success': False, 'error': 'SUBSCRIPTION EXPIRED', 'redirect': '/subscription'})
-                flash("Subscription expired.", "danger")
-                return redirect(url_for('subscription'))
+        if not current_user.has_active_subscription():
+            if request.path.startswith(('/calculate_api', '/calculate_batch')): return jsonify(
+                {'success': False, 'error': 'SUBSCRIPTION EXPIRED', 'redirect': '/subscription'})
+            flash("Subscription expired.", "danger")
+            return redirect(url_for('subscription'))
         return f(*args, **kwargs)
 
     return decorated_function
 
 
+# --- PENDING APPROVAL COUNT ---
+# Kept in memory and nudged by the UTR submit / approve / reject routes. Other workers' changes,
+# and users added by `flask import-legacy` (its own process), are picked up when the cached value
+# is older than PENDING_COUNT_TTL seconds.
+PENDING_COUNT_TTL = 60
+_pending_count = {'value': None, 'loaded_at': 0.0}
+_pending_count_lock = threading.Lock()
+
+
+def pending_approval_count():
+    with _pending_count_lock:
+        if _pending_count['value'] is None or time.monotonic() - _pending_count['loaded_at'] > PENDING_COUNT_TTL:
+            with metrics.span('pending_count'):
+                _pending_count['value'] = User.query.filter(User.submitted_utr != None, User.submitted_utr != "").count()
+            _pending_count['loaded_at'] = time.monotonic()
+        return _pending_count['value']
+
+
+def adjust_pending_count(delta):
+    with _pending_count_lock:
+        if _pending_count['value'] is not None: _pending_count['value'] = max(0, _pending_count['value'] + delta)
+
+
 @app.context_processor
 def inject_now():
-    return {'now': datetime.now(), 'pending_count': User.query.filter(User.submitted_utr != None).count()}
+    # pending_count is a lazy proxy: only templates that print it (the admin navbar) pay for it
+    return {'now': datetime.now(), 'pending_count': LocalProxy(pending_approval_count)}
+
+
+# --- METRICS ---
+# Installed before compress_response so its after_request hook runs last and times the whole response.
+METRICS_TOKEN = os.environ.get('CAWIRE_METRICS_TOKEN', '')
+metrics.install(app, Engine)
+metrics.gauge('cawire_sse_clients', 'Open /events streams.', lambda: live_events.subscriber_count())
+metrics.gauge('cawire_identity_cache_entries', 'Logged-in users held in the identity cache.', lambda: len(identity_cache))
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Prometheus scrape target: `Authorization: Bearer $CAWIRE_METRICS_TOKEN`, or an admin session
+    if not metrics.ENABLED: abort(404)
+    # bytes, not str: compare_digest raises TypeError on non-ASCII str, and any header value must get a 403
+    token_ok = METRICS_TOKEN and hmac.compare_digest(request.headers.get('Authorization', '').encode('utf-8'),
+                                                     f'Bearer {METRICS_TOKEN}'.encode('utf-8'))
+    if not token_ok and not (current_user.is_authenticated and current_user.role == 'admin'): abort(403)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.after_request
+def compress_response(response):
+    # Registered before add_header, so it runs after it and sees the final headers.
+    if (request.method == 'HEAD' or response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers or not compression.is_compressible(response.mimetype)):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = compression.choose_encoding(request.headers.get('Accept-Encoding'))
+    if not encoding: return response
+    if response.is_streamed:
+        response.response = compression.stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < compression.MIN_SIZE: return response
+        response.set_data(compression.compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def send_static_precompressed(filename):
+    # Replaces Flask's static view: sends a .br / .gz sibling written by `flask precompress-static`
+    # when the client accepts it, else the plain file.
+    if safe_join(app.static_folder, filename) is None: abort(404)
+    for encoding in compression.accepted_encodings(request.headers.get('Accept-Encoding')):
+        variant = compression.precompressed_variant(app.static_folder, filename, encoding)
+        if variant:
+            response = send_file(variant, mimetype=mimetypes.guess_type(filename)[0], conditional=True)
+            response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+            return response
+    response = app.send_static_file(filename)
+    if compression.is_compressible(response.mimetype): response.vary.add('Accept-Encoding')
+    return response
+
+
+app.view_functions['static'] = send_static_precompressed
+
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        version = assets.fingerprint(app.static_folder, values['filename'])
+        if version: values['v'] = version
+
+
+@app.template_global()
+def asset_url(filename):
+    # vendored copy when present, else the CDN it was downloaded from
+    if assets.is_vendored(app.static_folder, filename): return url_for('static', filename=filename)
+    return assets.VENDOR_ASSETS[filename][0]
 
 
 @app.after_request
 def add_header(response):
+    if request.endpoint == 'static':
+        response.headers['Cache-Control'] = assets.cache_control(app.static_folder, request.view_args['filename'],
+                                                                 request.args.get('v'))
+        return response
+    if request.endpoint in SELF_CACHED_ENDPOINTS: return response
+    # pages and JSON reflect live coil / subscription state: never cache them
     response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, post-check=0, pre-check=0, max-age=0'
     response.headers['Pragma'] = 'no-cache'
     response.headers['Expires'] = '-1'
     return response
 
 
+# --- SUBSCRIPTION STATUS ---
+def refresh_subscription_statuses(full=False):
+    raw = db.engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        if full:
+            changed = subscriptions.backfill_status(cur)
+            identity_cache.invalidate()
+        else:
+            changed_ids = subscriptions.refresh_status(cur)
+            for user_id in changed_ids: identity_cache.invalidate(user_id)
+            changed = len(changed_ids)
+        raw.commit()
+    finally:
+        raw.close()
+    return changed
+
+
+def _scheduled_status_refresh():
+    with app.app_context():
+        refresh_subscription_statuses()
+
+
+@app.before_request
+def start_status_scheduler():
+    subscriptions.start_scheduler(_scheduled_status_refresh)
+
+
+# --- CONSUMPTION ROLLUPS ---
+# Three 8-hour shifts starting at 06:00; a heat at 02:00 belongs to the previous day's C shift.
+SHIFT_START_HOUR = 6
+SHIFT_HOURS = 8
+SHIFT_NAMES = 'ABC'
+ROLLUP_DIMENSIONS = {'date': ConsumptionRollup.shift_date, 'shift': ConsumptionRollup.shift,
+                     'lf': ConsumptionRollup.lf_number, 'coil': ConsumptionRollup.coil_number}
+
+
+def shift_of(ts):
+    shifted = ts - timedelta(hours=SHIFT_START_HOUR)
+    return shifted.date(), SHIFT_NAMES[shifted.hour // SHIFT_HOURS]
+
+
+def record_rollup(log):
+    # Runs inside confirm_injection's transaction, so the rollup commits or rolls back with the log.
+    shift_date, shift = shift_of(log.timestamp)
+    stmt = sqlite_insert(ConsumptionRollup).values(
+        shift_date=shift_date, shift=shift, lf_number=log.lf_number or '', coil_number=log.coil_number or '',
+        heats=1, metres=log.calculated_length, tonnage=log.heat_tonnage or 0.0)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['shift_date', 'shift', 'lf_number', 'coil_number'],
+        set_={'heats': ConsumptionRollup.heats + 1, 'metres': ConsumptionRollup.metres + stmt.excluded.metres,
+              'tonnage': ConsumptionRollup.tonnage + stmt.excluded.tonnage}))
+
+
+def rebuild_rollups():
+    # Backfill: one GROUP BY over the whole log, with the shift maths of shift_of() done in SQL.
+    offset = f"'-{SHIFT_START_HOUR} hours'"
+    with db.engine.begin() as conn:
+        conn.execute(db.delete(ConsumptionRollup))
+        result = conn.exec_driver_sql(
+            'INSERT INTO consumption_rollup (shift_date, shift, lf_number, coil_number, heats, metres, tonnage) '
+            f'SELECT date(timestamp, {offset}), '
+            f"substr('{SHIFT_NAMES}', CAST(strftime('%H', timestamp, {offset}) AS INTEGER) / {SHIFT_HOURS} + 1, 1), "
+            "COALESCE(lf_number, ''), COALESCE(coil_number, ''), COUNT(*), SUM(calculated_length), "
+            'SUM(COALESCE(heat_tonnage, 0)) FROM injection_log '
+            'WHERE timestamp IS NOT NULL AND calculated_length IS NOT NULL GROUP BY 1, 2, 3, 4')
+        return result.rowcount
+
+
+def rollup_summary(dims, start=None, end=None):
+    columns = [ROLLUP_DIMENSIONS[d].label(d) for d in dims]
+    q = db.session.query(*columns, db.func.sum(ConsumptionRollup.heats), db.func.sum(ConsumptionRollup.metres),
+                         db.func.sum(ConsumptionRollup.tonnage))
+    if start: q = q.filter(ConsumptionRollup.shift_date >= start)
+    if end: q = q.filter(ConsumptionRollup.shift_date <= end)
+    rows = []
+    for row in q.group_by(*columns).order_by(*columns).all():
+        heats, metres, tonnage = row[-3:]
+        item = {d: (v.isoformat() if d == 'date' else v) for d, v in zip(dims, row)}
+        item.update(heats=heats, metres=round(metres, 2), tonnage=round(tonnage, 2),
+                    metres_per_heat=round(metres / heats, 2) if heats else 0,
+                    metres_per_tonne=round(metres / tonnage, 4) if tonnage else 0)
+        rows.append(item)
+    return rows
+
+
+def _analytics_range(args):
+    start = datetime.fromisoformat(args['start']).date() if args.get('start') else None
+    end = datetime.fromisoformat(args['end']).date() if args.get('end') else None
+    return start, end
+
+
 # --- ROUTES ---
 @app.route('/', methods=['GET'])
 def index():
@@ -729,7 +1485,7 @@ def index():
         return redirect(url_for('admin_panel'))
     else:
         # Standard users go to Subscription check or Dashboard
-        if current_user.subscription_expiry and current_user.subscription_expiry > datetime.now():
+        if current_user.has_active_subscription():
             return redirect(url_for('operator_dashboard'))
         return redirect(url_for('subscription'))
 
@@ -744,10 +1500,10 @@ def login():
         if user and check_password_hash(user.password, request.form.get('password')):
             # If Admin logs in here, strictly redirect to admin panel instead of showing error
             if user.role == 'admin':
-                login_user(user)
+                login_user(SessionUser(user))
                 return redirect(url_for('admin_panel'))
 
-            login_user(user)
+            login_user(SessionUser(user))
             return redirect(url_for('index'))
 
         flash('Invalid operator credentials', 'danger')
@@ -763,7 +1519,7 @@ def admin_login():
         # LOGIC: Must be admin role to enter here
         if user and check_password_hash(user.password, request.form.get('password')):
             if user.role == 'admin':
-                login_user(user)
+                login_user(SessionUser(user))
                 return redirect(url_for('admin_panel'))
             else:
                 flash('Unauthorized. Operators use the standard login.', 'warning')
@@ -804,9 +1560,90 @@ def admin_panel():
     if current_user.role != 'admin':
         abort(403)
 
+    now = datetime.now()
+    filters = {k: request.args[k] for k in USER_FILTER_KEYS if request.args.get(k)}
+    try:
+        conditions = user_filters(request.args)
+        users, prev_page, next_page = fetch_user_page(conditions, before=request.args.get('before'),
+                                                      after=request.args.get('after'))
+    except ValueError as e:
+        flash(f'Invalid filter: {e}', 'danger')
+        return redirect(url_for('admin_panel'))
     pending_users = User.query.filter(User.submitted_utr != None, User.submitted_utr != "").all()
-    all_users = User.query.all()
-    return render_template('admin.html', pending_users=pending_users, all_users=all_users, now=datetime.now())
+    return render_template('admin.html', pending_users=pending_users, users=users, total=count_users(conditions),
+                           filters=filters, prev_page=prev_page, next_page=next_page, now=now,
+                           expiring=upcoming_expiries(limit=5))
+
+
+@app.route('/admin/users')
+@login_required
+def admin_users_api():
+    if current_user.role != 'admin': abort(403)
+    try:
+        conditions = user_filters(request.args)
+        users, prev_page, next_page = fetch_user_page(conditions, before=request.args.get('before'),
+                                                      after=request.args.get('after'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'total': count_users(conditions), 'prev': prev_page, 'next': next_page,
+                    'users': [user_json(u) for u in users]})
+
+
+@app.route('/admin/users/expiring')
+@login_required
+def admin_users_expiring():
+    if current_user.role != 'admin': abort(403)
+    days = request.args.get('days', subscriptions.EXPIRING_SOON_DAYS, type=int)
+    return jsonify({'success': True, 'days': days, 'users': [user_json(u) for u in upcoming_expiries(days)]})
+
+
+@app.route('/admin/users/export')
+@login_required
+def admin_users_export():
+    if current_user.role != 'admin': abort(403)
+    try:
+        conditions = user_filters(request.args)
+    except ValueError as e:
+        flash(f'Invalid filter: {e}', 'danger')
+        return redirect(url_for('admin_panel'))
+    rows = ((uid, name, role or 'operator', status, expiry.strftime('%Y-%m-%d') if expiry else '', utr or '')
+            for uid, name, role, status, expiry, utr in iter_rows(User, USER_COLUMNS, conditions))
+    return Response(stream_with_context(exports.iter_csv(USER_EXPORT_HEADER, rows)), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=users.csv'})
+
+
+# --- PAYMENT QR ---
+QR_FOLDER = os.path.join(UPLOAD_FOLDER, 'qr')
+LEGACY_QR_PATH = os.path.join(UPLOAD_FOLDER, 'upi_qr.png')
+SELF_CACHED_ENDPOINTS = ('payment_qr', 'payment_qr_current', 'download_export_job')
+
+
+def set_current_qr(data):
+    digest = qr_store.store(qr_store.normalize(data), QR_FOLDER)
+    db.session.merge(AppSetting(key='upi_qr', value=digest))
+    db.session.commit()
+    return digest
+
+
+def current_qr_digest():
+    setting = db.session.get(AppSetting, 'upi_qr')
+    # the stored digest only counts while its file is there (uploads folder lost or not restored)
+    if setting and os.path.exists(qr_store.path_for(QR_FOLDER, setting.value)): return setting.value
+    if os.path.exists(LEGACY_QR_PATH):
+        # first run after the upgrade, or the stored file is gone: adopt the file the old upload
+        # route overwrote in place
+        with open(LEGACY_QR_PATH, 'rb') as f:
+            try:
+                return set_current_qr(f.read())
+            except qr_store.InvalidImage:
+                return None
+    return None
+
+
+@app.template_global()
+def payment_qr_url():
+    digest = current_qr_digest()
+    return url_for('payment_qr', digest=digest) if digest else ''
 
 
 @app.route('/admin/upload_qr', methods=['POST'])
@@ -816,20 +1653,47 @@ def admin_upload_qr():
     if 'file' in request.files:
         file = request.files['file']
         if file.filename != '':
-            file.save(os.path.join(app.config['UPLOAD_FOLDER'], 'upi_qr.png'))
-            flash('QR Code Updated!', 'success')
+            try:
+                set_current_qr(file.stream.read(qr_store.QR_MAX_BYTES + 1))
+                flash('QR Code Updated!', 'success')
+            except qr_store.InvalidImage as e:
+                flash(f'QR not updated: {e}', 'danger')
     return redirect(url_for('admin_panel'))
 
 
+@app.route('/qr/<digest>.png')
+def payment_qr(digest):
+    # content-addressed: the URL changes whenever the image does, so it can be cached for good
+    path = qr_store.path_for(QR_FOLDER, digest)
+    if not qr_store.DIGEST.match(digest) or not os.path.exists(path): abort(404)
+    response = send_file(path, mimetype='image/png', etag=digest, conditional=True, max_age=31536000)
+    response.cache_control.immutable = True
+    return response
+
+
+@app.route('/qr/current.png')
+def payment_qr_current():
+    # stable URL for kiosks / printouts: revalidated every time, 304 until the QR is replaced
+    digest = current_qr_digest()
+    if not digest: abort(404)
+    response = send_file(qr_store.path_for(QR_FOLDER, digest), mimetype='image/png', etag=digest, conditional=True)
+    response.cache_control.no_cache = True
+    return response
+
+
 @app.route('/admin/approve_payment', methods=['POST'])
 @login_required
 def admin_approve_payment():
     if current_user.role != 'admin': abort(403)
     user = User.query.get(request.form.get('user_id'))
     if user:
+        had_utr = bool(user.submitted_utr)
         user.subscription_expiry = datetime.now() + timedelta(days=30)
+        user.subscription_status = subscriptions.status_for(user.role, user.subscription_expiry)
         user.submitted_utr = None
         db.session.commit()
+        identity_cache.invalidate(user.id)
+        if had_utr: adjust_pending_count(-1)
         flash(f'Payment Approved for {user.username}. Access granted.', 'success')
     return redirect(url_for('admin_panel'))
 
@@ -840,12 +1704,53 @@ def admin_reject_payment():
     if current_user.role != 'admin': abort(403)
     user = User.query.get(request.form.get('user_id'))
     if user:
+        had_utr = bool(user.submitted_utr)
         user.submitted_utr = None
         db.session.commit()
+        identity_cache.invalidate(user.id)
+        if had_utr: adjust_pending_count(-1)
         flash(f'Payment Rejected for {user.username}.', 'danger')
     return redirect(url_for('admin_panel'))
 
 
+MAX_BULK_PAYMENTS = 1000
+
+
+@app.route('/admin/payments/bulk', methods=['POST'])
+@login_required
+def admin_bulk_payments():
+    # Approve or reject many pending UTRs with one UPDATE ... RETURNING. Only users that still have a
+    # UTR pending are touched, so the returned ids are exactly what left the Action Queue.
+    if current_user.role != 'admin': abort(403)
+    payload = request.get_json(silent=True)
+    if payload is None: payload = {}  # form post
+    raw_ids = payload.get('user_ids', request.form.getlist('user_ids')) if isinstance(payload, dict) else None
+    try:
+        # a string would be iterated digit by digit ("13" -> users 1 and 3), and true / 1.5 coerce quietly
+        if not isinstance(raw_ids, list) or any(isinstance(i, (bool, float)) for i in raw_ids): raise TypeError
+        ids = sorted({int(i) for i in raw_ids})
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'user_ids must be a list of integers'}), 400
+    action = payload.get('action', request.form.get('action'))
+    if action not in ('approve', 'reject'):
+        return jsonify({'success': False, 'error': "action must be 'approve' or 'reject'"}), 400
+    if not ids or len(ids) > MAX_BULK_PAYMENTS:
+        return jsonify({'success': False, 'error': f'send between 1 and {MAX_BULK_PAYMENTS} user_ids'}), 400
+    values = {'submitted_utr': None}
+    if action == 'approve':
+        values['subscription_expiry'] = expiry = datetime.now() + timedelta(days=30)
+        values['subscription_status'] = db.case((User.role == 'admin', 'permanent'),
+                                                else_=subscriptions.status_for('operator', expiry))
+    updated = db.session.execute(
+        db.update(User).where(User.id.in_(ids), User.submitted_utr != None, User.submitted_utr != "")
+        .values(**values).returning(User.id).execution_options(synchronize_session=False)).scalars().all()
+    db.session.commit()
+    for user_id in updated: identity_cache.invalidate(user_id)
+    adjust_pending_count(-len(updated))
+    return jsonify({'success': True, 'action': action, 'updated': sorted(updated),
+                    'skipped': sorted(set(ids) - set(updated)), 'pending_count': pending_approval_count()})
+
+
 @app.route('/subscription', methods=['GET', 'POST'])
 @login_required
 def subscription():
@@ -858,8 +1763,12 @@ def subscription():
         utr = request.form.get('utr')
         if utr:
             # ONLY save UTR. Do NOT grant time.
-            current_user.submitted_utr = utr
+            user = db.session.get(User, current_user.id)
+            had_utr = bool(user.submitted_utr)
+            user.submitted_utr = utr
             db.session.commit()
+            identity_cache.invalidate(user.id)
+            if not had_utr: adjust_pending_count(1)
             flash(f"UTR {utr} Submitted. Waiting for Admin Approval.", "info")
             return redirect(url_for('subscription'))
         else:
@@ -881,55 +1790,148 @@ def subscription():
 def operator_dashboard():
     if current_user.role == 'admin':
         return redirect(url_for('admin_panel'))
-    return render_template('operator_dashboard.html', coil=get_active_coil())
+    lf = current_lf(request.args.get('lf'))
+    coil = get_active_coil(lf)
+    return render_template('operator_dashboard.html', coil=coil, lf=lf, forecast=coil_forecast(coil))
+
+
+@app.route('/coil_forecast')
+@login_required
+@subscription_required
+def coil_forecast_api():
+    return jsonify({'success': True, **coil_forecast(get_active_coil(current_lf(request.args.get('lf'))))})
 
 
 @app.route('/calculate_api', methods=['POST'])
 @login_required
 @subscription_required
 def calculate_api():
-    d = request.json
-    c = get_active_coil()
+    with metrics.span('json_parse'):
+        d = request.json
     try:
-        tonnage, freeboard, speed, temp = float(d['tonnage']), float(d['freeboard']), float(d['speed']), float(
-            d['temp'])
-        pure_ca = (tonnage * 1000) * (c.target_ppm / 1000000)
-        gross_ca = pure_ca / (c.recovery_target / 100)
-        length = (gross_ca * 1000) / c.density
-        if freeboard > 500: length += int((freeboard - 500) // 50) * 20
-        if temp > 1600: length += int((temp - 1600) // 10) * 20
-        if float(d['al']) < 0.028: length += 40
-        if float(d['s']) > 0.010: length += int(round(float(d['s']) - 0.010, 5) // 0.001) * 10
-        if round(float(d['p_before']) - float(d['p_initial']), 5) > 0.003: length += int(
-            round(round(float(d['p_before']) - float(d['p_initial']), 5) - 0.003, 5) // 0.001) * 20
-        if float(d['si']) < 0.010: length += int(round(0.010 - float(d['si']), 5) // 0.001) * 10
-        return jsonify(
-            {'success': True, 'length_m': round(length, 2), 'time_min': round(length / speed if speed > 0 else 0, 2)})
+        if not isinstance(d, dict): raise ValueError('expected a JSON object')
+        with metrics.span('get_engine'):
+            engine = get_engine(current_lf(d.get('lf_number')))
+        with metrics.span('calc'):
+            length, time_min = engine.calculate(d)
+        return jsonify({'success': True, 'length_m': length, 'time_min': time_min})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 
+@app.route('/calculate_batch', methods=['POST'])
+@login_required
+@subscription_required
+def calculate_batch():
+    engine = get_engine(current_lf(request.args.get('lf')))
+    try:
+        lengths, times = engine.calculate_many(calc_engine.parse_batch_payload(request.json))
+        return jsonify({'success': True, 'count': len(lengths), 'coil_number': engine.coil_number,
+                        'length_m': lengths.tolist(), 'time_min': times.tolist()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+
+# --- LIVE EVENTS ---
+live_events = events.EventBus()
+
+
+def injection_json(log):
+    return {'id': log.id, 'timestamp': log.timestamp.isoformat(timespec='seconds'), 'heat_id': log.heat_id,
+            'lf_number': log.lf_number, 'coil_number': log.coil_number, 'heat_tonnage': log.heat_tonnage,
+            'calculated_length': log.calculated_length, 'balance_after': round(log.balance_after, 1)}
+
+
+@app.route('/events')
+@login_required
+def event_stream():
+    # Server-Sent Events: coil (balance after an injection), coil_config, injection, history_cleared
+    # no subscription: 204 (no flash, and EventSource does not reconnect) rather than subscription_required's redirect
+    if not current_user.has_active_subscription(): return Response(status=204)
+    last_id = request.headers.get('Last-Event-ID', '')
+    return Response(live_events.stream(int(last_id) if last_id.isdigit() else None),
+                    mimetype='text/event-stream', headers={'X-Accel-Buffering': 'no'})
+
+
+# form field names of the dosing inputs, where they differ from calc_engine.INPUT_FIELDS
+CONFIRM_FORM_FIELDS = {'si': 'si_pct'}
+
+
+def confirm_key(lf, heat_id):
+    # migrations.backfill_confirm_keys builds the same string in SQL
+    return f'{lf}/{heat_id}'
+
+
+def flash_if_confirmed(key, heat_id, lf):
+    row = db.session.execute(db.select(InjectionLog.timestamp, InjectionLog.calculated_length)
+                             .where(InjectionLog.confirm_key == key)).first()
+    if row:
+        flash(f"Heat {heat_id} on LF {lf} was already confirmed at {row.timestamp:%H:%M} "
+              f"({row.calculated_length}m); nothing deducted again", 'warning')
+    return row is not None
+
+
 @app.route('/confirm_injection', methods=['POST'])
 @login_required
 @subscription_required
 def confirm_injection():
-    c = get_active_coil()
-    l = float(request.form.get('calculated_length_hidden', 0))
+    lf = current_lf(request.form.get('lf_number'))
+    heat_id = (request.form.get('heat_id') or '').strip()
+    if not heat_id:
+        flash('Heat ID is required', 'danger')
+        return redirect(url_for('operator_dashboard'))
+    key = confirm_key(lf, heat_id)
+    # a double-click or resent form is answered from the first confirmation, without a write
+    if flash_if_confirmed(key, heat_id, lf): return redirect(url_for('operator_dashboard'))
+    fields = {k: (request.form.get(CONFIRM_FORM_FIELDS.get(k, k)) or '').strip() for k in calc_engine.INPUT_FIELDS}
+    missing = [CONFIRM_FORM_FIELDS.get(k, k) for k, v in fields.items() if not v]
+    if missing:
+        # a blank field must not count as 0: a blank Al alone adds about 40 m of wire
+        flash(f"Missing {', '.join(missing)}: calculate the heat again before confirming", 'danger')
+        return redirect(url_for('operator_dashboard'))
+    engine = get_engine(lf)
+    try:
+        d = {k: float(v) for k, v in fields.items()}
+        if not d['tonnage'] > 0: raise ValueError('heat tonnage must be greater than 0')
+        # the length is recomputed here, from the same cached engine as /calculate_api, not taken from the page
+        with metrics.span('calc'):
+            l, _ = engine.calculate(d)
+    except (ValueError, ZeroDivisionError) as e:
+        flash(f'Could not calculate the injection: {e}', 'danger')
+        return redirect(url_for('operator_dashboard'))
     if l > 0:
-        c.current_length -= l
-        c.heats_treated += 1
-        db.session.add(InjectionLog(heat_id=request.form.get('heat_id'), lf_number=request.form.get('lf_number'),
-                                    coil_number=c.coil_number, balance_after=c.current_length,
-                                    heat_tonnage=float(request.form.get('tonnage')),
-                                    freeboard=float(request.form.get('freeboard', 0)), calculated_length=l,
-                                    al_before=float(request.form.get('al', 0)),
-                                    s_before=float(request.form.get('s', 0)),
-                                    si_before=float(request.form.get('si_pct', 0)),
-                                    p_before=float(request.form.get('p_before', 0)),
-                                    p_initial_lf=float(request.form.get('p_initial', 0)),
-                                    temp=float(request.form.get('temp', 0))))
+        now = datetime.now()
+        log = InjectionLog(timestamp=now, heat_id=heat_id, lf_number=lf, coil_number=engine.coil_number,
+                           heat_tonnage=d['tonnage'], freeboard=d['freeboard'], calculated_length=l,
+                           al_before=d['al'], s_before=d['s'], si_before=d['si'], p_before=d['p_before'],
+                           p_initial_lf=d['p_initial'], temp=d['temp'], confirm_key=key)
+        try:
+            # Deduct in SQL so simultaneous confirmations from several LFs can't overwrite each other's
+            # balance; the UPDATE takes the write lock first, keeping the transaction to two statements.
+            log.balance_after, heats_treated, total_length = db.session.execute(
+                db.update(CoilConfig).where(CoilConfig.id == engine.coil_id)
+                .values(current_length=CoilConfig.current_length - l, heats_treated=CoilConfig.heats_treated + 1)
+                .returning(CoilConfig.current_length, CoilConfig.heats_treated, CoilConfig.total_length)).one()
+            db.session.add(log)
+            record_rollup(log)
+            db.session.flush()
+        except IntegrityError:
+            # the same heat posted concurrently and committed first: undo this deduction
+            db.session.rollback()
+            flash_if_confirmed(key, heat_id, lf)
+            return redirect(url_for('operator_dashboard'))
+        entry = injection_json(log)
         db.session.commit()
-        flash(f"Injected {l}m", "success")
+        forecast.record(engine.coil_id, heats_treated, now, l)
+        live_events.publish('injection', entry)
+        live_events.publish('coil', {'coil_id': engine.coil_id, 'coil_number': engine.coil_number,
+                                     'current_length': entry['balance_after'], 'total_length': total_length,
+                                     'heats_treated': heats_treated})
+        shown = request.form.get('calculated_length_hidden', type=float)
+        if shown is not None and shown > 0 and abs(shown - l) >= 0.01:
+            flash(f"Injected {l}m (recalculated; the page showed {shown}m)", "warning")
+        else:
+            flash(f"Injected {l}m", "success")
     return redirect(url_for('operator_dashboard'))
 
 
@@ -939,52 +1941,224 @@ def settings():
     # Only operators or admin can access, but generally admin uses admin panel
     if request.method == 'POST':
         c_num = request.form['coil_number'].strip()
-        exist = CoilConfig.query.filter_by(coil_number=c_num).first()
-        CoilConfig.query.update({CoilConfig.is_active: False})
-        if exist:
-            exist.is_active = True
-            exist.total_length = float(request.form['total_length'])
-            exist.density = float(request.form['density'])
-            exist.recovery_target = float(request.form['recovery_target'])
-            exist.target_ppm = float(request.form['target_ppm'])
-        else:
-            db.session.add(
-                CoilConfig(coil_number=c_num, is_active=True, total_length=float(request.form['total_length']),
-                           current_length=float(request.form['total_length']), density=float(request.form['density']),
-                           recovery_target=float(request.form['recovery_target']),
-                           target_ppm=float(request.form['target_ppm'])))
+        lf = lf_key(request.form.get('lf_number'))  # blank sets the plant default coil
+        coil = CoilConfig.query.filter_by(coil_number=c_num).first()
+        # retire only this LF's previous coil (an index lookup), leaving the other furnaces' rows alone
+        CoilConfig.query.filter(CoilConfig.is_active == True, CoilConfig.lf_number == lf,
+                                CoilConfig.coil_number != c_num).update({CoilConfig.is_active: False})
+        if coil is None:
+            coil = CoilConfig(coil_number=c_num, current_length=float(request.form['total_length']))
+            db.session.add(coil)
+        coil.is_active = True
+        coil.lf_number = lf
+        coil.total_length = float(request.form['total_length'])
+        coil.density = float(request.form['density'])
+        coil.recovery_target = float(request.form['recovery_target'])
+        coil.target_ppm = float(request.form['target_ppm'])
+        bump_coil_config_version()
+        db.session.flush()
+        changed = {'coil_id': coil.id, 'coil_number': c_num, 'lf_number': lf}
         db.session.commit()
+        invalidate_active_coils()
+        live_events.publish('coil_config', changed)
         flash('Settings Saved', 'success')
         return redirect(url_for('settings'))
-    return render_template('settings.html', coil=get_active_coil())
+    lf = lf_key(request.args['lf']) if 'lf' in request.args else current_lf()
+    active = CoilConfig.query.filter(CoilConfig.is_active == True).order_by(CoilConfig.lf_number).all()
+    return render_template('settings.html', coil=get_active_coil(lf), lf=lf, active_coils=active)
 
 
 @app.route('/history')
 @login_required
 def history():
-    return render_template('history.html',
-                           logs=InjectionLog.query.order_by(InjectionLog.timestamp.desc()).limit(50).all())
+    try:
+        logs, newer, older = fetch_log_page(log_filters(request.args), before=request.args.get('before'),
+                                            after=request.args.get('after'))
+    except ValueError as e:
+        flash(f'Invalid filter: {e}', 'danger')
+        return redirect(url_for('history'))
+    filters = {k: request.args[k] for k in LOG_FILTER_KEYS if request.args.get(k)}
+    return render_template('history.html', logs=logs, filters=filters, newer=newer, older=older)
 
 
 @app.route('/delete_history', methods=['POST'])
 @login_required
 def delete_history():
-    db.session.query(InjectionLog).delete();
+    db.session.query(InjectionLog).delete()
+    db.session.query(ConsumptionRollup).delete()
     db.session.commit()
+    forecast.invalidate()
+    export_spool.clear()
+    live_events.publish('history_cleared', {})
     return redirect(url_for('history'))
 
 
+@app.route('/analytics')
+@login_required
+def analytics():
+    try:
+        start, end = _analytics_range(request.args)
+    except ValueError:
+        flash('Invalid date range', 'danger')
+        return redirect(url_for('analytics'))
+    if not request.args.get('start') and not request.args.get('end'):
+        start = (datetime.now() - timedelta(days=6)).date()
+    return render_template('analytics.html', start=start, end=end,
+                           by_coil=rollup_summary(['coil'], start, end), by_lf=rollup_summary(['lf'], start, end),
+                           by_shift=rollup_summary(['date', 'shift', 'lf'], start, end))
+
+
+@app.route('/analytics/api')
+@login_required
+def analytics_api():
+    dims = [d for d in request.args.get('group', 'coil').split(',') if d]
+    if not dims or any(d not in ROLLUP_DIMENSIONS for d in dims):
+        return jsonify({'success': False, 'error': f"group must be a comma list of {', '.join(ROLLUP_DIMENSIONS)}"}), 400
+    try:
+        start, end = _analytics_range(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'group': dims, 'rows': rollup_summary(dims, start, end)})
+
+
 @app.route('/export_data')
 @login_required
 def export_data():
-    logs = InjectionLog.query.all()
-    if not logs: return redirect(url_for('history'))
-    data = [{'Time': l.timestamp, 'Heat': l.heat_id, 'Used': l.calculated_length} for l in logs]
-    out = io.BytesIO()
-    with pd.ExcelWriter(out, engine='openpyxl') as w: pd.DataFrame(data).to_excel(w, index=False)
+    fmt = request.args.get('format', 'xlsx')
+    if fmt not in exports.FORMATS: abort(400)
+    try:
+        conditions = log_filters(request.args)
+    except ValueError as e:
+        flash(f'Invalid export filter: {e}', 'danger')
+        return redirect(url_for('history'))
+    if not db.session.query(InjectionLog.id).filter(*conditions).first(): return redirect(url_for('history'))
+    rows = iter_log_rows(EXPORT_COLUMNS, conditions)
+    if fmt == 'csv':
+        return Response(stream_with_context(exports.iter_csv(EXPORT_HEADER, rows)), mimetype='text/csv',
+                        headers={'Content-Disposition': 'attachment; filename=logs.csv'})
+    # xlsx is a zip, so it can only be sent once complete; write-only mode keeps rows on disk meanwhile
+    out = tempfile.TemporaryFile()
+    exports.write_xlsx(EXPORT_HEADER, rows, out)
     out.seek(0)
-    return send_file(out, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                     as_attachment=True, download_name='logs.xlsx')
+    return send_file(out, mimetype=exports.XLSX_MIMETYPE, as_attachment=True, download_name='logs.xlsx')
+
+
+# --- EXPORT JOBS ---
+EXPORT_SPOOL_DIR = os.environ.get('CAWIRE_EXPORT_SPOOL', os.path.join(BASE_DIR, 'instance', 'exports'))
+export_spool = export_jobs.ExportSpool(EXPORT_SPOOL_DIR)
+
+
+def _export_rows(conditions):
+    # runs on an export pool thread
+    with app.app_context():
+        yield from iter_log_rows(EXPORT_COLUMNS, conditions)
+
+
+def _export_job_urls(job):
+    return {'status_url': url_for('export_job_status', job_id=job['job_id']),
+            'download_url': url_for('download_export_job', job_id=job['job_id'])}
+
+
+@app.route('/export_jobs', methods=['POST'])
+@login_required
+def create_export_job():
+    args = request.get_json(silent=True) or request.form
+    if not isinstance(args, dict): return jsonify({'success': False, 'error': 'expected a JSON object'}), 400
+    fmt = args.get('format', 'xlsx')
+    if fmt not in exports.FORMATS: return jsonify({'success': False, 'error': f"format must be one of {', '.join(exports.FORMATS)}"}), 400
+    filters = {k: str(args[k]) for k in LOG_FILTER_KEYS if args.get(k)}
+    try:
+        conditions = log_filters(filters)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid export filter: {e}'}), 400
+    # logs are append-only between clears, so (max id, count) under the filters pins the exact rows
+    max_id, total = db.session.query(db.func.max(InjectionLog.id), db.func.count(InjectionLog.id)).filter(*conditions).one()
+    if not total: return jsonify({'success': False, 'error': 'No logs match these filters'}), 404
+    key = export_jobs.job_key(fmt, filters, [DB_PATH, max_id, total])
+    job = export_spool.submit(key, fmt, filters, total, EXPORT_HEADER, lambda: _export_rows(conditions))
+    return jsonify({'success': True, **job, **_export_job_urls(job)}), 200 if job['status'] == 'done' else 202
+
+
+@app.route('/export_jobs/<job_id>')
+@login_required
+def export_job_status(job_id):
+    job = export_spool.get(job_id) if export_jobs.JOB_ID.match(job_id) else None
+    if not job: return jsonify({'success': False, 'error': 'Unknown export job'}), 404
+    return jsonify({'success': True, **job, **_export_job_urls(job)})
+
+
+@app.route('/export_jobs/<job_id>/download')
+@login_required
+def download_export_job(job_id):
+    # The file for a job id never changes, so its id is a strong ETag; conditional=True adds
+    # Range support, letting an interrupted download resume where it stopped.
+    job = export_spool.get(job_id) if export_jobs.JOB_ID.match(job_id) else None
+    if not job or job['status'] != 'done': abort(404)
+    path = export_spool.file_path(job_id, job['format'])
+    if not os.path.exists(path): abort(404)
+    response = send_file(path, mimetype=exports.FORMATS[job['format']][1], as_attachment=True,
+                         download_name=f"logs.{job['format']}", etag=job_id, conditional=True, max_age=3600)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+
+# --- CLI (flask --app app <command>) ---
+@app.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Create missing tables, columns and indexes and run pending data migrations."""
+    result = migrations.upgrade_schema(db)
+    print(f">>> SCHEMA: columns added: {', '.join(result['columns_added']) or 'none'}")
+    print(f">>> SCHEMA: migrations applied: {', '.join(result['migrations_applied']) or 'none'}")
+
+
+@app.cli.command('import-legacy')
+@click.argument('paths', nargs=-1, type=click.Path())
+@click.option('--keep-admin-roles', is_flag=True, help='Keep the admin role on imported accounts.')
+def import_legacy_command(paths, keep_admin_roles):
+    """Copy users, coils and injection logs from old production_vN.db files into the live DB."""
+    migrations.upgrade_schema(db)
+    for r in migrations.import_legacy(db.engine, paths, target_path=DB_PATH, keep_admin_roles=keep_admin_roles):
+        if r.get('error'):
+            print(f">>> {r['file']}: {r['error']}")
+        else:
+            print(f">>> {r['file']} (schema v{r['version']}): {r['users']} users, {r['coils']} coils, "
+                  f"{r['logs']} logs in {r['seconds']}s")
+    print(f">>> ROLLUPS: {rebuild_rollups()} rows rebuilt")
+    print(f">>> SUBSCRIPTIONS: {refresh_subscription_statuses(full=True)} users updated")
+
+
+@app.cli.command('vendor-assets')
+@click.option('--force', is_flag=True, help='Download again even if the file is already present.')
+def vendor_assets_command(force):
+    """Download the pinned Bootstrap / Font Awesome files into static/vendor (run once, online)."""
+    fetched = assets.download_vendor_assets(app.static_folder, force=force)
+    for filename, size in fetched: print(f">>> VENDOR: {filename} ({size} bytes)")
+    for filename in assets.modified_vendor_assets(app.static_folder):
+        print(f">>> VENDOR: {filename} does not match its pinned checksum; re-fetch it with --force")
+    print(f">>> VENDOR: {len(fetched)} files fetched, {len(assets.VENDOR_ASSETS) - len(fetched)} already present")
+    if fetched: precompress_static_command.callback()
+
+
+@app.cli.command('precompress-static')
+def precompress_static_command():
+    """Write .br / .gz copies of static CSS, JS and fonts next to the originals (run on deploy)."""
+    written = compression.precompress_dir(app.static_folder)
+    for variant, size, packed in written: print(f">>> PRECOMPRESS: {variant} {size} -> {packed} bytes")
+    print(f">>> PRECOMPRESS: {len(written)} files written ({', '.join(compression.available_encodings())})")
+
+
+@app.cli.command('refresh-subscriptions')
+@click.option('--full', is_flag=True, help='Recompute every user instead of only due transitions.')
+def refresh_subscriptions_command(full):
+    """Bring user.subscription_status up to date (for cron when CAWIRE_STATUS_INTERVAL=0)."""
+    print(f">>> SUBSCRIPTIONS: {refresh_subscription_statuses(full=full)} users updated")
+
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Rebuild the shift / LF / coil consumption rollups from the full InjectionLog."""
+    print(f">>> ROLLUPS: {rebuild_rollups()} rows rebuilt")
 
 
 if __name__ == '__main__':
@@ -992,7 +2166,7 @@ if __name__ == '__main__':
     # admin_panel()
 
     with app.app_context():
-        db.create_all()
+        migrations.upgrade_schema(db)
 
         # Default Admin setup
         if not User.query.filter_by(username='admin').first():
@@ -1000,7 +2174,8 @@ if __name__ == '__main__':
                 User(
                     username='admin',
                     password=generate_password_hash('admin123'),
-                    role='admin'
+                    role='admin',
+                    subscription_status='permanent'
                 )
             )
             db.session.commit()
@@ -0,0 +1,114 @@
+# =============================================================================
+# STATIC ASSETS
+# Bootstrap and Font Awesome are served from static/vendor/ so the UI loads on the plant
+# network without internet access. The files are committed unmodified, each pinned to the
+# SHA-384 the upstream project publishes for it; `flask vendor-assets` re-fetches them from the
+# CDN (e.g. after bumping a version) and refuses a download that does not match. asset_url()
+# falls back to the CDN for any file that is missing from the checkout.
+# url_for('static', ...) gets a ?v=<content hash> so static responses can be cached forever:
+# a changed file gets a new URL instead of a revalidation round trip.
+# =============================================================================
+import base64
+import hashlib
+import os
+import threading
+import urllib.request
+
+BOOTSTRAP = 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist'
+POPPER = 'https://cdn.jsdelivr.net/npm/@popperjs/core@2.11.8/dist'
+FONT_AWESOME = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0'
+# static-relative path -> (upstream URL, SRI checksum). Paths carry the version, so a vendor
+# upgrade is a new URL. Popper + bootstrap.min.js is Bootstrap's documented alternative to its
+# bundle; base.html loads Popper first.
+VENDOR_ASSETS = {
+    'vendor/bootstrap-5.3.0/css/bootstrap.min.css': (
+        f'{BOOTSTRAP}/css/bootstrap.min.css',
+        'sha384-9ndCyUaIbzAi2FUVXJi0CjmCapSmO7SnpJef0486qhLnuZ2cdeRhO02iuK6FUUVM'),
+    'vendor/popper-2.11.8/umd/popper.min.js': (
+        f'{POPPER}/umd/popper.min.js',
+        'sha384-I7E8VVD/ismYTF4hNIPjVp/Zjvgyol6VFvRkX/vR+Vc4jQkC+hVqc2pM8ODewa9r'),
+    'vendor/bootstrap-5.3.0/js/bootstrap.min.js': (
+        f'{BOOTSTRAP}/js/bootstrap.min.js',
+        'sha384-fbbOQedDUMZZ5KreZpsbe1LCZPVmfTnH7ois6mU1QK+m14rQ1l2bGBq41eYeM/fS'),
+    'vendor/fontawesome-6.4.0/css/all.min.css': (
+        f'{FONT_AWESOME}/css/all.min.css',
+        'sha384-iw3OoTErCYJJB9mCa8LNS2hbsQ7M3C0EpIsO/H5+EGAkPGc6rk+V8i04oW/K5xq0'),
+    # all.min.css loads its fonts from ../webfonts/
+    **{f'vendor/fontawesome-6.4.0/webfonts/{name}': (f'{FONT_AWESOME}/webfonts/{name}', checksum) for name, checksum in (
+        ('fa-solid-900.woff2', 'sha384-JtHMcbwFK+S5WYliXJYzBoASDLTpVrtok44OrbDd8U2VhZIuoYbT6fgtNq8ph8qq'),
+        ('fa-solid-900.ttf', 'sha384-Zr+WfH0OMrd25H7VyB+c7XK9hFubDWH/IM+eMMEIWOt/J0PDnhQWG2dhfrkpA4+n'),
+        ('fa-regular-400.woff2', 'sha384-jM2idOSdAjXKwtsNJIPFDTMFKnHFcgq5yN0XtLOH7VW1Fa5Wlaql/I1Nb3vWqnjT'),
+        ('fa-regular-400.ttf', 'sha384-EMKVTT8qczt0iiiSe6OrygwYLieq4ok9HwayZeRfxwBwnw6GiJmn00FOhDniXQN7'),
+        ('fa-brands-400.woff2', 'sha384-H4vXkkD4GugGt8gbZsez8Ht471PqODpNB04mrfJCK44j8IZnitMrJbKPUjD9bepP'),
+        ('fa-brands-400.ttf', 'sha384-fKOYuAEoNctp5sgUieMLWmhLs5ybUVdGVQesDxohYVwluJ0KI5Apt5lwzQqjLXlC'),
+        ('fa-v4compatibility.woff2', 'sha384-Vif/JYZ8tweTghS7HhWVH/ymhx1nBhdLEpNAsky9xsosHSBqSYyg73wjDaX9Ar9x'),
+        ('fa-v4compatibility.ttf', 'sha384-fLl50xZo0dNkl7hJfo2Pxf3dyZVmw0gOuwhMGM+mFTubdBwWngc8is2IFeUn8V/1'))},
+}
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+FINGERPRINT_LENGTH = 12
+
+_fingerprints = {}  # path -> ((mtime_ns, size), digest)
+_fingerprints_lock = threading.Lock()
+
+
+def fingerprint(static_dir, filename):
+    # Hash of the file's bytes, recomputed only when its mtime or size changes. None if missing.
+    path = os.path.join(static_dir, filename)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _fingerprints_lock:
+        cached = _fingerprints.get(path)
+        if cached and cached[0] == stamp: return cached[1]
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:FINGERPRINT_LENGTH]
+    with _fingerprints_lock:
+        _fingerprints[path] = (stamp, digest)
+    return digest
+
+
+def is_vendored(static_dir, filename):
+    return os.path.isfile(os.path.join(static_dir, filename))
+
+
+def cache_control(static_dir, filename, version):
+    # A URL whose ?v= matches the current content, or a version-pinned vendor path, never changes;
+    # anything else under /static is revalidated (Flask answers with a 304 when it hasn't changed).
+    if filename.startswith('vendor/'): return IMMUTABLE
+    if version and version == fingerprint(static_dir, filename): return IMMUTABLE
+    return REVALIDATE
+
+
+def integrity(body):
+    return 'sha384-' + base64.b64encode(hashlib.sha384(body).digest()).decode()
+
+
+def modified_vendor_assets(static_dir):
+    # vendored files whose bytes no longer match the pinned upstream checksum
+    modified = []
+    for filename, (_, checksum) in VENDOR_ASSETS.items():
+        path = os.path.join(static_dir, filename)
+        if not os.path.exists(path): continue
+        with open(path, 'rb') as f:
+            if integrity(f.read()) != checksum: modified.append(filename)
+    return modified
+
+
+def download_vendor_assets(static_dir, force=False):
+    fetched = []
+    for filename, (url, checksum) in VENDOR_ASSETS.items():
+        path = os.path.join(static_dir, filename)
+        if os.path.exists(path) and not force: continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with urllib.request.urlopen(url, timeout=30) as resp:
+            body = resp.read()
+        if integrity(body) != checksum: raise ValueError(f'{url} does not match {checksum}')
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(body)
+        os.replace(tmp, path)
+        fetched.append((filename, len(body)))
+    return fetched
@@ -0,0 +1,96 @@
+# Shared setup for the benchmark scripts: points the app at a throwaway SQLite file,
+# seeds an operator with an active subscription plus a coil (unless coil=False), and returns a
+# logged-in test client.
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+OPERATOR = ('bench_operator', 'bench_pass')
+ADMIN = ('bench_admin', 'bench_pass')
+
+
+def load_app(db_path=None, coil=True):
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='cawire_bench_'), 'bench.db')
+    os.environ['CAWIRE_DB_PATH'] = db_path
+    import app as app_module
+    from werkzeug.security import generate_password_hash
+
+    with app_module.app.app_context():
+        app_module.db.create_all()
+        if not app_module.User.query.filter_by(username=OPERATOR[0]).first():
+            app_module.db.session.add(app_module.User(username=OPERATOR[0],
+                                                      password=generate_password_hash(OPERATOR[1]),
+                                                      role='operator',
+                                                      subscription_expiry=datetime.now() + timedelta(days=365),
+                                                      subscription_status='active'))
+            app_module.db.session.commit()
+        if coil: app_module.get_active_coil()
+    return app_module
+
+
+def seed(app_module, users=0, coils=0, logs=0, chunk=20000):
+    # A plant's worth of data, bulk-inserted: users in every subscription state (every 10th with a
+    # UTR waiting for approval), coils with the first three bound to LF 1-3, and injection logs three
+    # minutes apart ending now, spread over the coils. Rebuilds the rollups afterwards.
+    now = datetime.now()
+    states = (('active', timedelta(days=200)), ('expiring', timedelta(days=3)), ('expired', timedelta(days=-30)))
+    tables = app_module.User.__table__, app_module.CoilConfig.__table__, app_module.InjectionLog.__table__
+    with app_module.app.app_context():
+        with app_module.db.engine.begin() as conn:
+            for start in range(0, users, chunk):
+                conn.execute(tables[0].insert(), [
+                    {'username': f'seed_op{i:07d}', 'password': 'x', 'role': 'operator',
+                     'subscription_status': states[i % 3][0], 'subscription_expiry': now + states[i % 3][1],
+                     'submitted_utr': f'UTR{i:09d}' if i % 10 == 0 else None}
+                    for i in range(start, min(users, start + chunk))])
+            if coils:
+                conn.execute(tables[1].insert(), [
+                    {'coil_number': f'SEED-{i:04d}', 'is_active': i < 3, 'lf_number': str(i + 1) if i < 3 else '',
+                     'total_length': 50000.0, 'current_length': 50000.0, 'heats_treated': 0}
+                    for i in range(coils)])
+            per_coil = max(1, -(-logs // max(coils, 1)))
+            for start in range(0, logs, chunk):
+                rows = []
+                for i in range(start, min(logs, start + chunk)):
+                    lf = str(i % 3 + 1)
+                    rows.append({'timestamp': now - timedelta(minutes=3 * (logs - i)), 'heat_id': f'S{i}',
+                                 'lf_number': lf, 'coil_number': f'SEED-{i // per_coil:04d}' if coils else 'COIL-001',
+                                 'calculated_length': 200.0 + i % 97 / 7, 'heat_tonnage': 140.0 + i % 20,
+                                 'balance_after': 50000.0 - (i % per_coil) * 250, 'confirm_key': f'{lf}/S{i}'})
+                conn.execute(tables[2].insert(), rows)
+        app_module.rebuild_rollups()
+        app_module.invalidate_active_coils()
+
+
+def operator_client(app_module):
+    client = app_module.app.test_client()
+    client.post('/login', data={'username': OPERATOR[0], 'password': OPERATOR[1]})
+    return client
+
+
+def admin_client(app_module):
+    from werkzeug.security import generate_password_hash
+
+    with app_module.app.app_context():
+        if not app_module.User.query.filter_by(username=ADMIN[0]).first():
+            app_module.db.session.add(app_module.User(username=ADMIN[0], password=generate_password_hash(ADMIN[1]),
+                                                      role='admin', subscription_status='permanent'))
+            app_module.db.session.commit()
+    client = app_module.app.test_client()
+    client.post('/admin/login', data={'username': ADMIN[0], 'password': ADMIN[1]})
+    return client
+
+
+def timed(fn, repeat=1):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
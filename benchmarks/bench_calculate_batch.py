@@ -0,0 +1,57 @@
+# Compares N single-heat /calculate_api calls with one /calculate_batch call for the same heats,
+# both over the Flask test client and as bare function calls, and checks the results agree.
+#
+#   python benchmarks/bench_calculate_batch.py [N]
+import random
+import sys
+
+from _harness import load_app, operator_client, timed
+
+
+def make_heats(n, seed=42):
+    rnd = random.Random(seed)
+    return [{'tonnage': round(rnd.uniform(120, 180), 1), 'freeboard': rnd.randint(350, 800),
+             'speed': 120, 'temp': rnd.randint(1560, 1660), 'al': round(rnd.uniform(0.02, 0.05), 3),
+             's': round(rnd.uniform(0.002, 0.02), 3), 'si': round(rnd.uniform(0.002, 0.3), 3),
+             'p_initial': round(rnd.uniform(0.008, 0.015), 3), 'p_before': round(rnd.uniform(0.008, 0.02), 3)}
+            for _ in range(n)]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    app_module = load_app()
+    client = operator_client(app_module)
+    heats = make_heats(n)
+
+    scalar_results = []
+
+    def scalar_http():
+        scalar_results.clear()
+        for h in heats:
+            r = client.post('/calculate_api', json=h).get_json()
+            scalar_results.append((r['length_m'], r['time_min']))
+
+    batch_result = {}
+
+    def batch_http():
+        batch_result.update(client.post('/calculate_batch', json={'heats': heats}).get_json())
+
+    t_scalar_http = timed(scalar_http)
+    t_batch_http = timed(batch_http, repeat=3)
+    assert batch_result['success'], batch_result
+    assert scalar_results == list(zip(batch_result['length_m'], batch_result['time_min'])), 'results differ'
+
+    with app_module.app.app_context():
+        engine = app_module.get_engine()
+        t_scalar_fn = timed(lambda: [engine.calculate(h) for h in heats], repeat=3)
+        t_batch_fn = timed(lambda: engine.calculate_many(app_module.calc_engine.parse_batch_payload(heats)), repeat=3)
+
+    print(f'heats: {n} (results identical)')
+    print(f'HTTP      {n} x /calculate_api: {t_scalar_http * 1000:9.1f} ms   '
+          f'1 x /calculate_batch: {t_batch_http * 1000:7.1f} ms   speedup {t_scalar_http / t_batch_http:6.1f}x')
+    print(f'function  scalar loop:           {t_scalar_fn * 1000:9.1f} ms   '
+          f'vectorized:           {t_batch_fn * 1000:7.1f} ms   speedup {t_scalar_fn / t_batch_fn:6.1f}x')
+
+
+if __name__ == '__main__':
+    main()
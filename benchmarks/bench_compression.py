@@ -0,0 +1,66 @@
+# Bytes on the wire per page (and for the CSV export and vendored static files) with no
+# compression, gzip and brotli, as chosen by the request's Accept-Encoding. Static files are
+# measured after `flask precompress-static`; brotli rows need the optional `brotli` package.
+#
+#   python benchmarks/bench_compression.py [export_rows]
+import sys
+
+from _harness import admin_client, load_app, operator_client, timed
+
+OPERATOR_PAGES = ('/operator_dashboard', '/history', '/analytics', '/settings', '/subscription')
+ADMIN_PAGES = ('/admin', '/admin/users')
+STATIC_FILES = ('vendor/bootstrap-5.3.0/css/bootstrap.min.css', 'vendor/popper-2.11.8/umd/popper.min.js',
+                'vendor/bootstrap-5.3.0/js/bootstrap.min.js', 'vendor/fontawesome-6.4.0/css/all.min.css', 'css/app.css')
+
+
+def seed(app_module, users, logs):
+    from datetime import datetime, timedelta
+
+    t0 = datetime(2025, 1, 1)
+    with app_module.app.app_context():
+        with app_module.db.engine.begin() as conn:
+            conn.execute(app_module.User.__table__.insert(), [
+                {'username': f'op{i:05d}', 'password': 'x', 'role': 'operator', 'subscription_status': 'active',
+                 'subscription_expiry': t0 + timedelta(days=400)} for i in range(users)])
+            conn.execute(app_module.InjectionLog.__table__.insert(), [
+                {'timestamp': t0 + timedelta(minutes=3 * i), 'heat_id': f'H{i}', 'lf_number': str(i % 3 + 1),
+                 'coil_number': 'COIL-001', 'calculated_length': 200.0 + i % 97 / 7, 'heat_tonnage': 150.0}
+                for i in range(logs)])
+        app_module.rebuild_rollups()
+
+
+def wire_bytes(client, path, encoding):
+    resp = client.get(path, headers={'Accept-Encoding': encoding} if encoding else {})
+    body = b''.join(resp.response) if resp.is_streamed else resp.data
+    return len(body), resp.headers.get('Content-Encoding', 'identity')
+
+
+def report(client, label, paths, encodings):
+    for path in paths:
+        sizes = [wire_bytes(client, path, enc) for enc in encodings]
+        cols = '  '.join(f'{enc or "identity":>8} {size:>9} B' for enc, (size, _) in zip(encodings, sizes))
+        print(f'{label:<8} {path:<60} {cols}')
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    app_module = load_app()
+    seed(app_module, 200, rows)
+    encodings = [None, 'gzip'] + (['br'] if app_module.compression.brotli else [])
+    written = app_module.compression.precompress_dir(app_module.app.static_folder)
+    print(f'precompressed {len(written)} static variants')
+
+    operator, admin = operator_client(app_module), admin_client(app_module)
+    report(operator, 'page', OPERATOR_PAGES, encodings)
+    report(admin, 'page', ADMIN_PAGES, encodings)
+    report(operator, 'export', ('/export_data?format=csv',), encodings)
+    report(operator, 'static', [f'/static/{f}' for f in STATIC_FILES], encodings)
+    for enc in encodings[1:]:
+        ms = timed(lambda: operator.get('/history', headers={'Accept-Encoding': enc}).data, 20) * 1000
+        print(f'/history render + {enc} : {ms:.2f} ms')
+    print(f'/history render only : {timed(lambda: operator.get("/history").data, 20) * 1000:.2f} ms')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
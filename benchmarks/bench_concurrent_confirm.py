@@ -0,0 +1,72 @@
+# Concurrent /confirm_injection load: several worker processes (like gunicorn workers) and
+# threads confirm injections against one coil at the same time, each heat posted twice (a
+# double-click / resent form), then the coil balance, heat counter and InjectionLog are
+# checked for lost updates and for replays that deducted again.
+#
+#   python benchmarks/bench_concurrent_confirm.py [processes] [threads] [confirms_per_thread]
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+from _harness import load_app, operator_client
+
+HEAT = {'tonnage': 150, 'temp': 1580, 'freeboard': 400, 'speed': 120, 'al': 0.04, 's': 0.005, 'si': 0.2,
+        'p_initial': 0.012, 'p_before': 0.015}
+FORM = dict(HEAT, si_pct=HEAT['si'])
+
+
+def worker(db_path, worker_id, threads, confirms, results):
+    app_module = load_app(db_path)
+    failures = []
+
+    def run(thread_id):
+        client = operator_client(app_module)
+        for i in range(confirms):
+            form = dict(FORM, heat_id=f'W{worker_id}-T{thread_id}-{i}', lf_number=str(worker_id % 3 + 1))
+            for _ in range(2):
+                r = client.post('/confirm_injection', data=form)
+                if r.status_code != 302: failures.append(r.status_code)
+
+    pool = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for t in pool: t.start()
+    for t in pool: t.join()
+    results.put(len(failures))
+
+
+def main():
+    processes, threads, confirms = (int(a) for a in (sys.argv[1:] + ['4', '4', '50'][len(sys.argv) - 1:])[:3])
+    app_module = load_app()
+    db_path = os.environ['CAWIRE_DB_PATH']
+    with app_module.app.app_context():
+        coil = app_module.get_active_coil()
+        start_length, start_heats = coil.current_length, coil.heats_treated
+        length = app_module.get_engine().calculate(HEAT)[0]
+
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    t0 = time.perf_counter()
+    procs = [ctx.Process(target=worker, args=(db_path, p, threads, confirms, results)) for p in range(processes)]
+    for p in procs: p.start()
+    failures = sum(results.get() for _ in procs)
+    for p in procs: p.join()
+    elapsed = time.perf_counter() - t0
+
+    expected = processes * threads * confirms
+    with app_module.app.app_context():
+        app_module.db.session.expire_all()
+        coil = app_module.db.session.get(app_module.CoilConfig, coil.id)
+        logs = app_module.InjectionLog.query.count()
+        lost_m = (start_length - expected * length) - coil.current_length
+        print(f'{expected} heats ({2 * expected} posts) from {processes} processes x {threads} threads in {elapsed:.1f} s '
+              f'({expected / elapsed:.0f}/s), failed requests: {failures}')
+        print(f'coil balance {coil.current_length:.1f} m (expected {start_length - expected * length:.1f}), '
+              f'heats {coil.heats_treated - start_heats}/{expected}, log rows {logs}/{expected}')
+        ok = failures == 0 and abs(lost_m) < 1e-6 and coil.heats_treated - start_heats == expected and logs == expected
+    print('OK: no lost updates, no double deductions' if ok else 'FAIL: lost updates, replays or failed requests')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
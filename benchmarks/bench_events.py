@@ -0,0 +1,71 @@
+# Live updates over Server-Sent Events: N browsers keep /events open on a real local threaded
+# WSGI server while injections are confirmed; reports how long until every client has the new
+# coil balance, next to what the same N clients would cost re-rendering the dashboard instead.
+#
+#   python benchmarks/bench_events.py [clients] [injections]
+import http.client
+import logging
+import sys
+import threading
+import time
+
+from _harness import load_app, operator_client, timed
+
+
+def main():
+    clients, injections = (int(a) for a in (sys.argv[1:] + ['50', '20'][len(sys.argv) - 1:])[:2])
+    app_module = load_app()
+    client = operator_client(app_module)
+    cookie = f"session={client.get_cookie('session').value}"
+
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    received = [0] * injections
+    done = [threading.Event() for _ in range(injections)]
+    lock = threading.Lock()
+    ready = threading.Barrier(clients + 1)
+
+    def listen():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        conn.request('GET', '/events', headers={'Cookie': cookie})
+        resp = conn.getresponse()
+        resp.readline()  # retry: line, sent as soon as the stream opens
+        ready.wait()
+        seen = 0
+        while seen < injections:
+            line = resp.readline()
+            if not line: break
+            if line.startswith(b'event: coil\n'):
+                with lock:
+                    received[seen] += 1
+                    if received[seen] == clients: done[seen].set()
+                seen += 1
+        conn.close()
+
+    for _ in range(clients): threading.Thread(target=listen, daemon=True).start()
+    ready.wait()
+    form = {'heat_id': 'H', 'lf_number': '1', 'tonnage': 150, 'freeboard': 400, 'speed': 120, 'temp': 1580,
+            'al': 0.04, 's': 0.005, 'si_pct': 0.2, 'p_initial': 0.012, 'p_before': 0.015}
+    fanout = []
+    for i in range(injections):
+        t0 = time.perf_counter()
+        client.post('/confirm_injection', data=dict(form, heat_id=f'H{i}'))
+        done[i].wait(30)
+        fanout.append(time.perf_counter() - t0)
+    fanout.sort()
+    server.shutdown()
+
+    page = timed(lambda: client.get('/operator_dashboard').data, repeat=20)
+    print(f'{clients} SSE clients, {injections} injections')
+    print(f'confirm + every client has the new balance: p50 {fanout[len(fanout) // 2] * 1000:.1f} ms, '
+          f'max {fanout[-1] * 1000:.1f} ms')
+    print(f'reloading instead: {clients} x /operator_dashboard = {clients * page * 1000:.1f} ms of server time '
+          f'per injection ({page * 1000:.2f} ms each)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# Synchronous /export_data vs a background export job: how long the request holds the worker,
+# how long until the file is ready, the repeat export of unchanged data (served from the spool),
+# and resuming a download with a Range request.
+#
+#   python benchmarks/bench_export_jobs.py [rows]
+import os
+import sys
+import tempfile
+import time
+
+from _harness import load_app, operator_client, timed
+
+
+def seed(app_module, rows):
+    from datetime import datetime, timedelta
+
+    t0 = datetime(2025, 1, 1)
+    with app_module.app.app_context():
+        with app_module.db.engine.begin() as conn:
+            conn.execute(app_module.InjectionLog.__table__.insert(), [
+                {'timestamp': t0 + timedelta(minutes=3 * i), 'heat_id': f'H{i}', 'lf_number': str(i % 3 + 1),
+                 'coil_number': 'COIL-001', 'calculated_length': 200.0 + i % 97 / 7, 'heat_tonnage': 150.0}
+                for i in range(rows)])
+
+
+def wait_for(client, job):
+    while True:
+        status = client.get(job['status_url']).get_json()
+        if status['status'] in ('done', 'failed'): return status
+        time.sleep(0.02)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    os.environ.setdefault('CAWIRE_EXPORT_SPOOL', tempfile.mkdtemp(prefix='cawire_spool_'))
+    app_module = load_app()
+    seed(app_module, rows)
+    client = operator_client(app_module)
+    print(f'{rows} log rows')
+    for fmt in ('xlsx', 'csv'):
+        sync = timed(lambda: client.get(f'/export_data?format={fmt}').get_data())
+        t0 = time.perf_counter()
+        resp = client.post('/export_jobs', json={'format': fmt})
+        queued = time.perf_counter() - t0
+        job = resp.get_json()
+        done = wait_for(client, job)
+        ready = time.perf_counter() - t0
+        cached = timed(lambda: client.post('/export_jobs', json={'format': fmt}).get_json(), repeat=5)
+        full = client.get(job['download_url']).data
+        tail = client.get(job['download_url'], headers={'Range': f'bytes={len(full) // 2}-'})
+        print(f'{fmt:<5} sync request {sync * 1000:8.1f} ms | job: POST {queued * 1000:6.1f} ms ({resp.status_code}), '
+              f'ready after {ready * 1000:8.1f} ms ({done["status"]}), repeat POST {cached * 1000:5.2f} ms | '
+              f'{len(full)} B, Range -> {tail.status_code} {len(tail.data)} B')
+
+
+if __name__ == '__main__':
+    main()
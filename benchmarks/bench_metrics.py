@@ -0,0 +1,52 @@
+# Cost of the request / query / template instrumentation: the same requests timed in
+# processes with CAWIRE_METRICS=1 and CAWIRE_METRICS=0, alternating, best of ROUNDS.
+#
+#   python benchmarks/bench_metrics.py [requests]
+import os
+import subprocess
+import sys
+import time
+
+from _harness import load_app, operator_client
+
+ROUNDS = 3
+HEAT = {'tonnage': 150, 'freeboard': 400, 'speed': 120, 'temp': 1580, 'al': 0.04, 's': 0.005, 'si': 0.2,
+        'p_initial': 0.012, 'p_before': 0.015}
+
+
+def measure(n):
+    app_module = load_app()
+    client = operator_client(app_module)
+    for path, send in (('/calculate_api', lambda: client.post('/calculate_api', json=HEAT)),
+                       ('/operator_dashboard', lambda: client.get('/operator_dashboard')),
+                       ('/history', lambda: client.get('/history'))):
+        for _ in range(50): send()
+        times = []
+        for _ in range(n):
+            t0 = time.perf_counter()
+            send()
+            times.append(time.perf_counter() - t0)
+        times.sort()
+        print(f'{path} {times[len(times) // 2] * 1e6:.0f} {times[int(len(times) * 0.99)] * 1e6:.0f}')
+
+
+def main():
+    n = sys.argv[1] if len(sys.argv) > 1 else '2000'
+    results = {'0': {}, '1': {}}
+    for _ in range(ROUNDS):
+        for flag in ('0', '1'):
+            out = subprocess.run([sys.executable, __file__, '--child', n], capture_output=True, text=True, check=True,
+                                 env=dict(os.environ, CAWIRE_METRICS=flag, CAWIRE_STATUS_INTERVAL='0')).stdout
+            for path, p50, p99 in (line.split() for line in out.splitlines()):
+                best = results[flag].get(path, (float('inf'), float('inf')))
+                results[flag][path] = (min(best[0], float(p50)), min(best[1], float(p99)))
+    print(f'{n} requests each, p50 / p99 in microseconds')
+    for path, (p50_off, p99_off) in results['0'].items():
+        p50_on, p99_on = results['1'][path]
+        print(f'{path:<22} off {p50_off:7.0f} / {p99_off:7.0f}   on {p50_on:7.0f} / {p99_on:7.0f}   '
+              f'p50 overhead {p50_on - p50_off:+5.0f} us ({(p50_on / p50_off - 1) * 100:+.1f}%)')
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']: measure(int(sys.argv[2]))
+    else: main()
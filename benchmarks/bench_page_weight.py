@@ -0,0 +1,61 @@
+# Page weight of the main screens: HTML plus every stylesheet, script and image it links,
+# for a first visit (empty cache) and a repeat visit (browser cache obeying Cache-Control).
+# Local /static files are fetched through the test client; links to other hosts are counted
+# but not fetched, since each one is a request that stalls when the plant network is offline.
+#
+#   python benchmarks/bench_page_weight.py
+import re
+import sys
+from urllib.parse import urlsplit
+
+from _harness import admin_client, load_app, operator_client
+
+OPERATOR_PAGES = ('/operator_dashboard', '/history', '/analytics', '/settings', '/subscription')
+ADMIN_PAGES = ('/admin',)
+ASSET_LINK = re.compile(rb'<(?:link|script|img)\b[^>]*?(?:href|src)="([^"]+)"')
+
+
+def page_weight(client, path, cache):
+    # cache: url -> (Cache-Control, ETag, Last-Modified) from earlier responses, as a browser keeps it
+    html = client.get(path)
+    stats = {'html': len(html.data), 'assets': 0, 'requests': 1, 'external': 0}
+    for raw in ASSET_LINK.findall(html.data):
+        url = raw.decode().replace('&amp;', '&')
+        if urlsplit(url).netloc:
+            stats['external'] += 1
+            continue
+        cached = cache.get(url)
+        if cached and 'immutable' in cached[0]: continue
+        headers = {}
+        if cached and 'no-store' not in cached[0]:
+            if cached[1]: headers['If-None-Match'] = cached[1]
+            if cached[2]: headers['If-Modified-Since'] = cached[2]
+        resp = client.get(url, headers=headers)
+        stats['requests'] += 1
+        stats['assets'] += len(resp.data)
+        cache[url] = (resp.headers.get('Cache-Control', ''), resp.headers.get('ETag'),
+                      resp.headers.get('Last-Modified'))
+        resp.close()
+    return stats
+
+
+def report(client, pages):
+    cache = {}
+    for path in pages:
+        first = page_weight(client, path, cache)
+        repeat = page_weight(client, path, cache)
+        print(f'{path:<20} first: {first["html"]:>6} B html + {first["assets"]:>7} B static '
+              f'in {first["requests"]:>2} req, {first["external"]} external | '
+              f'repeat: {repeat["html"] + repeat["assets"]:>6} B in {repeat["requests"]:>2} req, '
+              f'{repeat["external"]} external')
+
+
+def main():
+    app_module = load_app()
+    report(operator_client(app_module), OPERATOR_PAGES)
+    report(admin_client(app_module), ADMIN_PAGES)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+# Consumption analytics: the per-coil / per-LF / per-shift summaries read from ConsumptionRollup
+# versus the same GROUP BY run over the raw InjectionLog, plus the cost of the full backfill.
+# Also checks that rollups kept by confirm_injection match a rebuild from the log.
+#
+#   python benchmarks/bench_rollups.py [seed_rows]
+import sys
+from datetime import datetime, timedelta
+
+from _harness import load_app, operator_client, timed
+
+CONFIRM = {'heat_id': 'R1', 'lf_number': '2', 'tonnage': 150, 'temp': 1580, 'freeboard': 400, 'speed': 120,
+           'al': 0.04, 's': 0.008, 'si_pct': 0.02, 'p_before': 0.012, 'p_initial': 0.012, 'calculated_length_hidden': 250}
+
+
+def seed_logs(app_module, rows):
+    t0 = datetime(2025, 1, 1)
+    with app_module.app.app_context():
+        with app_module.db.engine.begin() as conn:
+            conn.execute(app_module.InjectionLog.__table__.insert(), [
+                {'timestamp': t0 + timedelta(minutes=3 * i), 'heat_id': f'S{i}', 'lf_number': str(i % 3 + 1),
+                 'coil_number': f'COIL-{i // 5000:03d}', 'calculated_length': 200.0 + i % 97,
+                 'heat_tonnage': 140.0 + i % 20} for i in range(rows)])
+
+
+def raw_summary(app_module, dim):
+    # what a report would have to run without the rollup table
+    sql = {'coil': 'coil_number',
+           'lf': 'lf_number',
+           'shift': "date(timestamp, '-6 hours'), substr('ABC', CAST(strftime('%H', timestamp, '-6 hours') AS INTEGER) / 8 + 1, 1), lf_number"}[dim]
+    with app_module.db.engine.connect() as conn:
+        return conn.exec_driver_sql(f'SELECT {sql}, COUNT(*), SUM(calculated_length), SUM(heat_tonnage) '
+                                    f'FROM injection_log GROUP BY {sql}').fetchall()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    app_module = load_app()
+    seed_logs(app_module, rows)
+    dims = {'coil': ['coil'], 'lf': ['lf'], 'shift': ['date', 'shift', 'lf']}
+    with app_module.app.app_context():
+        print(f'backfill of {rows} logs            {timed(app_module.rebuild_rollups) * 1000:8.1f} ms')
+        for name, group in dims.items():
+            raw = timed(lambda: raw_summary(app_module, name), 3)
+            rolled = timed(lambda: app_module.rollup_summary(group), 3)
+            n = len(app_module.rollup_summary(group))
+            assert n == len(raw_summary(app_module, name)), name
+            print(f'by {name:<6} ({n:>5} groups)  raw log {raw * 1000:8.1f} ms   rollup {rolled * 1000:8.1f} ms')
+
+    client = operator_client(app_module)
+    for i in range(20):
+        client.post('/confirm_injection', data=dict(CONFIRM, heat_id=f'R{i}', lf_number=str(i % 3 + 1)))
+    with app_module.app.app_context():
+        live = app_module.rollup_summary(['date', 'shift', 'lf', 'coil'])
+        app_module.rebuild_rollups()
+        rebuilt = app_module.rollup_summary(['date', 'shift', 'lf', 'coil'])
+    print('incremental rollups match rebuild:', live == rebuilt)
+    return 0 if live == rebuilt else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
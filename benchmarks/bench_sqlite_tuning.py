@@ -0,0 +1,90 @@
+# Read/write throughput with and without the storage.py PRAGMA tuning. Each mode runs in its
+# own interpreter against a fresh database seeded with InjectionLog rows:
+#   commits   - single-row INSERT + COMMIT loop on one connection (fsync / journal cost)
+#   mixed     - reader threads paging /history while writer threads post /confirm_injection
+#
+#   python benchmarks/bench_sqlite_tuning.py [seconds] [readers] [writers] [seed_rows]
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from _harness import load_app, operator_client
+
+MODES = {'untuned (SQLite defaults)': {'CAWIRE_SQLITE_TUNING': '0'}, 'tuned (storage.py)': {}}
+
+
+def seed_logs(app_module, rows):
+    t0 = datetime(2025, 1, 1)
+    with app_module.app.app_context():
+        with app_module.db.engine.begin() as conn:
+            conn.execute(app_module.InjectionLog.__table__.insert(), [
+                {'timestamp': t0 + timedelta(minutes=3 * i), 'heat_id': f'S{i}', 'lf_number': str(i % 3 + 1),
+                 'coil_number': 'COIL-001', 'calculated_length': 250.0, 'heat_tonnage': 150.0} for i in range(rows)])
+
+
+def run_mode(seconds, readers, writers, seed_rows):
+    app_module = load_app()
+    seed_logs(app_module, seed_rows)
+
+    with app_module.app.app_context():
+        conn = app_module.db.engine.raw_connection()
+        cur = conn.cursor()
+        n, t_end = 0, time.perf_counter() + min(seconds, 3)
+        t0 = time.perf_counter()
+        while time.perf_counter() < t_end:
+            cur.execute("INSERT INTO injection_log (heat_id, calculated_length) VALUES ('raw', 1.0)")
+            conn.commit()
+            n += 1
+        commits = n / (time.perf_counter() - t0)
+        conn.close()
+
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def reader(i):
+        client = operator_client(app_module)
+        while time.perf_counter() < stop:
+            ok = client.get(f'/history?lf={i % 3 + 1}').status_code == 200
+            with lock: counts['reads' if ok else 'errors'] += 1
+
+    def writer(i):
+        client = operator_client(app_module)
+        while time.perf_counter() < stop:
+            ok = client.post('/confirm_injection', data={
+                'heat_id': f'B{i}', 'lf_number': '1', 'tonnage': 150, 'temp': 1580, 'freeboard': 400, 'speed': 120,
+                'al': 0.04, 's': 0.005, 'si_pct': 0.2, 'p_initial': 0.012, 'p_before': 0.015,
+                'calculated_length_hidden': 10}).status_code == 302
+            with lock: counts['writes' if ok else 'errors'] += 1
+
+    pool = ([threading.Thread(target=reader, args=(i,)) for i in range(readers)] +
+            [threading.Thread(target=writer, args=(i,)) for i in range(writers)])
+    for t in pool: t.start()
+    for t in pool: t.join()
+    print(json.dumps({'commits_per_s': commits, 'reads_per_s': counts['reads'] / seconds,
+                      'writes_per_s': counts['writes'] / seconds, 'errors': counts['errors']}))
+
+
+def main():
+    args = [int(a) for a in sys.argv[1:]]
+    seconds, readers, writers, seed_rows = (args + [10, 4, 2, 50000][len(args):])[:4]
+    if os.environ.get('_CAWIRE_BENCH_CHILD'):
+        return run_mode(seconds, readers, writers, seed_rows)
+    print(f'{seconds}s mixed load, {readers} readers / {writers} writers, {seed_rows} seeded rows, '
+          f'db in {tempfile.gettempdir()}')
+    print(f'{"mode":28} {"raw commits/s":>14} {"reads/s":>9} {"writes/s":>9} {"errors":>7}')
+    for name, env in MODES.items():
+        out = subprocess.run([sys.executable, __file__, *map(str, (seconds, readers, writers, seed_rows))],
+                             env=dict(os.environ, _CAWIRE_BENCH_CHILD='1', **env),
+                             capture_output=True, text=True, check=True)
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f'{name:28} {r["commits_per_s"]:14.0f} {r["reads_per_s"]:9.1f} {r["writes_per_s"]:9.1f} {r["errors"]:7d}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# Worker boot cost: wall time and peak RSS of a fresh interpreter importing the app,
+# with and without pandas preloaded (pandas was a top-level import before exports went lazy),
+# plus the one-off cost the first export now pays for loading openpyxl.
+#
+#   python benchmarks/bench_startup.py [runs]
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from _harness import ROOT
+
+PROBE = '''
+import resource, sys, time, json
+t0 = time.perf_counter()
+{preload}
+import app
+t1 = time.perf_counter()
+{after}
+t2 = time.perf_counter()
+print(json.dumps({{"import_s": t1 - t0, "after_s": t2 - t1,
+                   "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+'''
+
+SCENARIOS = {
+    'app (pandas eager, old)': ('import pandas', ''),
+    'app (lazy exports)': ('', ''),
+    'app + first xlsx export': ('', 'import io, exports; exports.write_xlsx(("a",), [(1,)], io.BytesIO())'),
+}
+
+
+def run(preload, after, runs):
+    samples = []
+    db_path = os.path.join(tempfile.mkdtemp(prefix='cawire_bench_'), 'startup.db')
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', PROBE.format(preload=preload, after=after)], cwd=ROOT,
+                             capture_output=True, text=True, check=True,
+                             env=dict(os.environ, CAWIRE_DB_PATH=db_path))
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return (statistics.median(s['import_s'] for s in samples), statistics.median(s['after_s'] for s in samples),
+            statistics.median(s['rss_mb'] for s in samples))
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f'{"scenario":28} {"import ms":>10} {"extra ms":>9} {"peak RSS MB":>12}   (median of {runs})')
+    for name, (preload, after) in SCENARIOS.items():
+        t_import, t_after, rss = run(preload, after, runs)
+        print(f'{name:28} {t_import * 1000:10.1f} {t_after * 1000:9.1f} {rss:12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# Regression check for the per-LF coil lookup: with no coil for the requested LF and no plant
+# default, the first calculate / batch / confirm request must create the default coil and answer,
+# not hang on the engine cache. Each case starts from an empty coil table. Exits 1 on a failure;
+# a hang is turned into a traceback and exit after TIMEOUT seconds.
+#
+#   python benchmarks/check_active_coils.py
+import faulthandler
+import sys
+
+from _harness import load_app, operator_client
+
+TIMEOUT = 30
+HEAT = {'tonnage': 150, 'freeboard': 400, 'speed': 120, 'temp': 1580, 'al': 0.04, 's': 0.005, 'si': 0.2,
+        'p_initial': 0.012, 'p_before': 0.015}
+SETTINGS = {'coil_number': 'COIL-001', 'total_length': 5000, 'density': 68, 'recovery_target': 20, 'target_ppm': 30}
+
+
+def reset(app_module):
+    with app_module.app.app_context():
+        app_module.CoilConfig.query.delete()
+        app_module.db.session.commit()
+        app_module.invalidate_active_coils()
+
+
+def calculate(client):
+    return client.post('/calculate_api', json=dict(HEAT, lf_number='2')).get_json()['success']
+
+
+def cases(client):
+    yield 'calculate_api first', lambda: calculate(client)
+    yield 'calculate_batch first', lambda: client.post(
+        '/calculate_batch?lf=2', json=[HEAT]).get_json()['success']
+    yield 'confirm_injection first', lambda: client.post('/confirm_injection', data=dict(
+        HEAT, si_pct=HEAT['si'], heat_id='CHK-1', lf_number='2')).status_code == 302
+    # the plant default is rebound to LF 1, so LF 2 has no coil of its own and no default to fall back on
+    yield 'default moved to LF 1, then LF 2', lambda: (
+        calculate(client) and client.post('/settings', data=dict(SETTINGS, lf_number='1')).status_code == 302
+        and calculate(client))
+
+
+def main():
+    faulthandler.dump_traceback_later(TIMEOUT, exit=True)
+    app_module = load_app(coil=False)
+    client = operator_client(app_module)
+    failed = 0
+    for name, run in cases(client):
+        reset(app_module)
+        ok = run()
+        with app_module.app.app_context():
+            ok = ok and app_module.CoilConfig.query.filter_by(lf_number='', is_active=True).count() == 1
+        failed += not ok
+        print(f'{"ok  " if ok else "FAIL"} {name}')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
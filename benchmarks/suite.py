@@ -0,0 +1,207 @@
+# Load test for the main routes, run in-process (Flask test client) and over HTTP against a
+# local threaded WSGI server, on a freshly seeded SQLite database of the requested size.
+# Reports throughput and p50 / p99 latency per route and compares them with a JSON baseline,
+# so a change that slows a route down shows up as a regression.
+#
+#   python benchmarks/suite.py                                # 10k logs, compare with baseline.json
+#   python benchmarks/suite.py --logs 1000000 --requests 500  # bigger plant
+#   python benchmarks/suite.py --update-baseline              # record this run as the baseline
+#   python benchmarks/suite.py --check                        # exit 1 on a regression (CI)
+import argparse
+import http.client
+import json
+import logging
+import math
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from datetime import datetime
+
+from _harness import ROOT, admin_client, load_app, operator_client, seed
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+HEAT = {'tonnage': 150, 'freeboard': 400, 'speed': 120, 'temp': 1580, 'al': 0.04, 's': 0.005, 'si': 0.2,
+        'p_initial': 0.012, 'p_before': 0.015}
+
+
+def scenarios(args):
+    # name -> (who, method, path, body kind, expected status, requests); confirm bodies get a fresh heat id
+    light, heavy = args.requests, args.export_requests
+    return {
+        'calculate_api': ('operator', 'POST', '/calculate_api', 'json', 200, light),
+        'confirm_injection': ('operator', 'POST', '/confirm_injection', 'confirm', 302, light),
+        'history': ('operator', 'GET', '/history', None, 200, light),
+        'history_filtered': ('operator', 'GET', '/history?lf=2', None, 200, light),
+        'admin': ('admin', 'GET', '/admin', None, 200, light),
+        'export_data_csv': ('operator', 'GET', '/export_data?format=csv', None, 200, heavy),
+        'export_data_xlsx': ('operator', 'GET', '/export_data', None, 200, heavy),
+    }
+
+
+def request_body(kind, n, tag):
+    if kind == 'json': return json.dumps(HEAT), 'application/json'
+    if kind == 'confirm':
+        form = dict(HEAT, si_pct=HEAT['si'], heat_id=f'{tag}-{n}', lf_number=str(n % 3 + 1))
+        return urllib.parse.urlencode(form), 'application/x-www-form-urlencoded'
+    return None, None
+
+
+def percentile(sorted_values, p):
+    return sorted_values[max(0, math.ceil(p * len(sorted_values)) - 1)]
+
+
+def summarize(latencies, errors, wall):
+    latencies.sort()
+    return {'requests': len(latencies), 'errors': errors, 'rps': round(len(latencies) / wall, 1),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3), 'p99_ms': round(percentile(latencies, 0.99) * 1000, 3)}
+
+
+# --- IN-PROCESS (test client) ---
+def run_inprocess(app_module, clients, args):
+    results = {}
+    for name, (who, method, path, kind, expected, count) in scenarios(args).items():
+        client = clients[who]
+        latencies, errors = [], 0
+        t_start = time.perf_counter()
+        for n in range(count):
+            body, ctype = request_body(kind, n, 'inproc')
+            t0 = time.perf_counter()
+            resp = client.open(path, method=method, data=body, content_type=ctype)
+            resp.get_data()
+            latencies.append(time.perf_counter() - t0)
+            if resp.status_code != expected: errors += 1
+        results[name] = summarize(latencies, errors, time.perf_counter() - t_start)
+        print_row('inprocess', name, results[name])
+    return results
+
+
+# --- OVER HTTP (local threaded WSGI server) ---
+def run_server(app_module, clients, args):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True, request_handler=KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    cookies = {who: f"session={client.get_cookie('session').value}" for who, client in clients.items()}
+    results = {}
+    try:
+        for name, (who, method, path, kind, expected, count) in scenarios(args).items():
+            per_thread = [[] for _ in range(args.concurrency)]
+            errors = [0] * args.concurrency
+
+            def worker(t):
+                conn = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=600)
+                cookie = cookies[who]
+                for n in range(t, count, args.concurrency):
+                    body, ctype = request_body(kind, n, f'http-{name}')
+                    headers = {'Cookie': cookie}
+                    if ctype: headers['Content-Type'] = ctype
+                    t0 = time.perf_counter()
+                    conn.request(method, path, body=body, headers=headers)
+                    resp = conn.getresponse()
+                    resp.read()
+                    per_thread[t].append(time.perf_counter() - t0)
+                    if resp.status != expected: errors[t] += 1
+                    set_cookie = resp.getheader('Set-Cookie') or ''
+                    if set_cookie.startswith('session='): cookie = set_cookie.split(';', 1)[0]
+                conn.close()
+
+            threads = [threading.Thread(target=worker, args=(t,)) for t in range(args.concurrency)]
+            t_start = time.perf_counter()
+            for t in threads: t.start()
+            for t in threads: t.join()
+            results[name] = summarize([x for lat in per_thread for x in lat], sum(errors), time.perf_counter() - t_start)
+            print_row(f'http x{args.concurrency}', name, results[name])
+    finally:
+        server.shutdown()
+    return results
+
+
+def print_row(mode, name, r):
+    print(f'{mode:<10} {name:<20} {r["requests"]:>6} req {r["rps"]:>9.1f}/s  p50 {r["p50_ms"]:>9.2f} ms  '
+          f'p99 {r["p99_ms"]:>9.2f} ms  errors {r["errors"]}')
+
+
+# --- BASELINE ---
+def environment(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'date': datetime.now().isoformat(timespec='seconds'), 'commit': commit,
+            'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version, 'machine': platform.machine(),
+            'scale': {'users': args.users, 'coils': args.coils, 'logs': args.logs},
+            'requests': args.requests, 'export_requests': args.export_requests, 'concurrency': args.concurrency}
+
+
+def compare(run, baseline, tolerance):
+    # A route regresses when its p50 grows by more than `tolerance` over the baseline at the same scale.
+    if baseline['env']['scale'] != run['env']['scale']:
+        print(f"\nbaseline is for {baseline['env']['scale']}, this run {run['env']['scale']}: not compared")
+        return []
+    regressions = []
+    print(f"\nvs baseline ({baseline['env']['date']}, {baseline['env']['commit'] or '?'}), p50:")
+    for mode, routes in run['results'].items():
+        for name, r in routes.items():
+            base = baseline['results'].get(mode, {}).get(name)
+            if not base: continue
+            change = r['p50_ms'] / base['p50_ms'] - 1 if base['p50_ms'] else 0.0
+            flag = 'REGRESSION' if change > tolerance or r['errors'] > base['errors'] else ''
+            if flag: regressions.append(f'{mode}/{name}')
+            print(f'{mode:<10} {name:<20} {base["p50_ms"]:>9.2f} -> {r["p50_ms"]:>9.2f} ms  {change * 100:+6.1f}%  {flag}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the main routes and compare with a JSON baseline.')
+    parser.add_argument('--logs', type=int, default=10000, help='injection log rows to seed (10k-1M)')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--coils', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=300, help='requests per route')
+    parser.add_argument('--export-requests', type=int, default=3, help='requests per export route')
+    parser.add_argument('--concurrency', type=int, default=4, help='client threads in server mode')
+    parser.add_argument('--mode', choices=('inprocess', 'server', 'both'), default='both')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help='write this run to --baseline')
+    parser.add_argument('--out', help='also write this run to a JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p50 slowdown, 0.25 = 25%%')
+    parser.add_argument('--check', action='store_true', help='exit 1 if a route regressed against the baseline')
+    args = parser.parse_args()
+
+    os.environ.setdefault('CAWIRE_STATUS_INTERVAL', '0')
+    app_module = load_app()
+    t0 = time.perf_counter()
+    seed(app_module, users=args.users, coils=args.coils, logs=args.logs)
+    print(f"seeded {args.users} users, {args.coils} coils, {args.logs} logs in {time.perf_counter() - t0:.1f} s "
+          f"({os.environ['CAWIRE_DB_PATH']})")
+    clients = {'operator': operator_client(app_module), 'admin': admin_client(app_module)}
+
+    results = {}
+    if args.mode in ('inprocess', 'both'): results['inprocess'] = run_inprocess(app_module, clients, args)
+    if args.mode in ('server', 'both'): results['server'] = run_server(app_module, clients, args)
+    run = {'env': environment(args), 'results': results}
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            regressions = compare(run, json.load(f), args.tolerance)
+    for path in filter(None, (args.out, args.baseline if args.update_baseline else None)):
+        with open(path, 'w') as f:
+            json.dump(run, f, indent=2)
+            f.write('\n')
+        print(f'wrote {path}')
+    if regressions: print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+    sys.exit(1 if args.check and regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+# =============================================================================
+# CA-WIRE DOSING ENGINE
+# Pure calculation code shared by calculate_api, calculate_batch, confirm_injection
+# and offline tools. No Flask / DB imports here: the app hands in the coil row.
+# =============================================================================
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+INPUT_FIELDS = ('tonnage', 'freeboard', 'speed', 'temp', 'al', 's', 'si', 'p_initial', 'p_before')
+MAX_BATCH_SIZE = 50000
+DIFF_DECIMALS = 5
+
+# field:     input (or derived value) the rule looks at
+# direction: 'above' fires when value > threshold, 'below' when value < threshold
+# step:      None = flat add; otherwise add `add` metres per whole `step` past the threshold
+# rounded:   round the excess to DIFF_DECIMALS before dividing (chemistry values)
+Rule = namedtuple('Rule', 'field direction threshold step add rounded')
+
+RULES = (
+    Rule('freeboard', 'above', 500, 50, 20, False),   # mm
+    Rule('temp', 'above', 1600, 10, 20, False),       # deg C
+    Rule('al', 'below', 0.028, None, 40, False),      # Al %
+    Rule('s', 'above', 0.010, 0.001, 10, True),       # S %
+    Rule('delta_p', 'above', 0.003, 0.001, 20, True),  # P pickup since LF arrival %
+    Rule('si', 'below', 0.010, 0.001, 10, True),      # Si %
+)
+
+
+class DosingEngine:
+    # Snapshot of one coil's dosing parameters. The constant sub-expressions of the base
+    # formula are precomputed; the remaining operations keep their original order so results
+    # stay bit-identical to the lengths already stored in InjectionLog.
+    def __init__(self, coil, rules=RULES):
+        self.coil_id = coil.id
+        self.coil_number = coil.coil_number
+        self.target_ppm = coil.target_ppm
+        self.recovery_target = coil.recovery_target
+        self.density = coil.density
+        self.rules = rules
+        self.ppm_fraction = coil.target_ppm / 1000000
+        self.recovery_fraction = coil.recovery_target / 100
+        # grams of Ca per tonne of steel -> metres of wire per tonne (for display / estimates)
+        self.metres_per_tonne = (1000 * self.ppm_fraction / self.recovery_fraction * 1000 / self.density
+                                 if self.recovery_fraction and self.density else 0.0)
+
+    # --- SCALAR PATH ---
+    def calculate(self, d):
+        values = {k: float(d[k]) for k in INPUT_FIELDS}
+        values['delta_p'] = round(values['p_before'] - values['p_initial'], DIFF_DECIMALS)
+        length = (((values['tonnage'] * 1000) * self.ppm_fraction / self.recovery_fraction) * 1000) / self.density
+        for r in self.rules:
+            v = values[r.field]
+            if r.direction == 'above':
+                if not v > r.threshold: continue
+                excess = v - r.threshold
+            else:
+                if not v < r.threshold: continue
+                excess = r.threshold - v
+            if r.step is None:
+                length += r.add
+            else:
+                if r.rounded: excess = round(excess, DIFF_DECIMALS)
+                length += int(excess // r.step) * r.add
+        speed = values['speed']
+        return round(length, 2), round(length / speed if speed > 0 else 0, 2)
+
+    # --- VECTORIZED PATH (same operations, element-wise) ---
+    def calculate_many(self, cols):
+        if self.recovery_fraction == 0 or self.density == 0: raise ZeroDivisionError('float division by zero')
+        values = dict(cols)
+        values['delta_p'] = round_like_python(cols['p_before'] - cols['p_initial'], DIFF_DECIMALS)
+        length = (((cols['tonnage'] * 1000) * self.ppm_fraction / self.recovery_fraction) * 1000) / self.density
+        for r in self.rules:
+            v = values[r.field]
+            if r.direction == 'above':
+                hit, excess = v > r.threshold, v - r.threshold
+            else:
+                hit, excess = v < r.threshold, r.threshold - v
+            if r.step is None:
+                length = np.where(hit, length + r.add, length)
+            else:
+                if r.rounded: excess = round_like_python(excess, DIFF_DECIMALS)
+                length = np.where(hit, length + (excess // r.step) * r.add, length)
+        speed = cols['speed']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            time = np.where(speed > 0, length / speed, 0.0)
+        return round_like_python(length, 2), round_like_python(time, 2)
+
+
+def round_like_python(values, ndigits):
+    # np.round scales, rints and unscales, which can disagree with Python's correctly rounded round()
+    # only when the scaled value sits on a .5 tie; those few elements are redone with round() itself.
+    out = np.round(values, ndigits)
+    scaled = values * 10.0 ** ndigits
+    ties = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    if ties.any():
+        idx = np.nonzero(ties)[0]
+        out[idx] = [round(float(v), ndigits) for v in values[idx]]
+    return out
+
+
+def parse_batch_payload(payload):
+    # Accepts a list of heat dicts, {"heats": [...]} or columnar {"columns": {"tonnage": [...], ...}}
+    if isinstance(payload, dict) and 'columns' in payload:
+        raw = {k: payload['columns'][k] for k in INPUT_FIELDS}
+    else:
+        heats = payload['heats'] if isinstance(payload, dict) else payload
+        raw = {k: [h[k] for h in heats] for k in INPUT_FIELDS}
+    n = len(raw['tonnage'])
+    if n > MAX_BATCH_SIZE: raise ValueError(f'batch too large ({n} > {MAX_BATCH_SIZE})')
+    cols = {}
+    for k, values in raw.items():
+        if len(values) != n: raise ValueError(f"column '{k}' has {len(values)} values, expected {n}")
+        cols[k] = np.fromiter(map(float, values), dtype=float, count=n)
+        if not np.isfinite(cols[k]).all(): raise ValueError(f"non-finite value in '{k}'")
+    return cols
+
+
+# --- PROCESS-WIDE CACHE ---
+# One engine per ladle furnace, built from that LF's active coil on first use and dropped
+# only when a coil's settings change (app.check_coil_config_version notices that in every
+# worker), so calculations do not query the coil table.
+_engines = {}  # lf_number -> DosingEngine
+_generation = {'n': 0}  # bumped by invalidate(), so an engine built from a replaced coil is not cached
+_engine_lock = threading.Lock()
+
+
+def get_engine(load_coil, lf=''):
+    engine = _engines.get(lf)
+    if engine is None:
+        # load_coil() runs outside the lock: it queries, and on a fresh install creates, the coil
+        generation = _generation['n']
+        engine = DosingEngine(load_coil())
+        with _engine_lock:
+            if _generation['n'] == generation: engine = _engines.setdefault(lf, engine)
+    return engine
+
+
+def invalidate():
+    with _engine_lock:
+        _engines.clear()
+        _generation['n'] += 1
@@ -0,0 +1,107 @@
+# =============================================================================
+# RESPONSE COMPRESSION
+# gzip always, brotli when the `brotli` package is installed (optional: pip install brotli).
+#   - dynamic HTML / JSON / CSV: compressed per response above MIN_SIZE bytes
+#   - streamed responses (CSV export): compressed chunk by chunk, flushing after each chunk
+#     so the download starts immediately and memory stays flat
+#   - static files: `flask precompress-static` writes .br / .gz siblings once; the static
+#     route sends them as-is instead of compressing on every request
+# =============================================================================
+import gzip
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5            # per-request: fast, still well ahead of gzip -6
+BROTLI_STATIC_QUALITY = 11    # precompressed once, so spend the CPU
+COMPRESSIBLE_TYPES = ('text/html', 'text/css', 'text/csv', 'text/plain', 'text/javascript',
+                      'application/javascript', 'application/json', 'image/svg+xml',
+                      'font/ttf', 'application/x-font-ttf')
+STATIC_EXTENSIONS = ('.css', '.js', '.svg', '.ttf', '.html', '.json', '.txt')
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def available_encodings():
+    return ('br', 'gzip') if brotli else ('gzip',)
+
+
+def accepted_encodings(accept_encoding):
+    # Encodings the client accepts (q > 0), in our order of preference.
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name: accepted[name.strip().lower()] = q
+    return [e for e in available_encodings() if accepted.get(e, accepted.get('*', 0)) > 0]
+
+
+def choose_encoding(accept_encoding):
+    encodings = accepted_encodings(accept_encoding)
+    return encodings[0] if encodings else None
+
+
+def is_compressible(mimetype):
+    return mimetype in COMPRESSIBLE_TYPES
+
+
+def compress(data, encoding):
+    if encoding == 'br': return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def stream(chunks, encoding):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            out = compressor.process(chunk) + compressor.flush()
+            if out: yield out
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # 16+: gzip framing
+    for chunk in chunks:
+        out = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if out: yield out
+    yield compressor.flush()
+
+
+def precompressed_variant(static_dir, filename, encoding):
+    # path of an up-to-date .br / .gz sibling, or None
+    path = os.path.join(static_dir, filename)
+    variant = path + SUFFIXES[encoding]
+    try:
+        return variant if os.stat(variant).st_mtime_ns >= os.stat(path).st_mtime_ns else None
+    except OSError:
+        return None
+
+
+def precompress_dir(static_dir, min_size=MIN_SIZE):
+    # Writes missing or stale .gz / .br siblings; keeps a variant only if it is actually smaller.
+    written = []
+    for root, _dirs, files in os.walk(static_dir):
+        for name in files:
+            if not name.endswith(STATIC_EXTENSIONS): continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < min_size: continue
+            for encoding in available_encodings():
+                variant = path + SUFFIXES[encoding]
+                if precompressed_variant(root, name, encoding): continue
+                if encoding == 'br': body = brotli.compress(data, quality=BROTLI_STATIC_QUALITY)
+                else: body = gzip.compress(data, compresslevel=9, mtime=0)
+                if len(body) >= len(data): continue
+                with open(variant, 'wb') as f:
+                    f.write(body)
+                written.append((os.path.relpath(variant, static_dir), len(data), len(body)))
+    return written
@@ -0,0 +1,86 @@
+# =============================================================================
+# LIVE EVENTS (Server-Sent Events)
+# A small in-process publish/subscribe bus. Routes publish after they commit (coil balance,
+# new injections); every open /events stream has its own bounded queue and turns what it
+# receives into SSE frames. Publishing is a few dict/queue operations, however many pages
+# are listening, and nobody has to poll or reload to see another LF's injection.
+# The last REPLAY_SIZE events are kept so a browser reconnecting with Last-Event-ID
+# catches up on what it missed. A client that falls QUEUE_SIZE events behind is dropped
+# and reconnects the same way.
+# The bus is per process: run the app with one (threaded) worker process, or only clients
+# of the worker that handled a write see that write.
+# =============================================================================
+import json
+import queue
+import threading
+from collections import deque
+
+QUEUE_SIZE = 100
+REPLAY_SIZE = 200
+KEEPALIVE_SECONDS = 15
+RETRY_MS = 3000  # browser reconnect delay
+
+
+def format_sse(event_id, event, data):
+    return f'id: {event_id}\nevent: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'.encode('utf-8')
+
+
+class EventBus:
+    def __init__(self, queue_size=QUEUE_SIZE, replay_size=REPLAY_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._recent = deque(maxlen=replay_size)  # (id, frame)
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def publish(self, event, data):
+        with self._lock:
+            frame = format_sse(self._next_id, event, data)
+            self._recent.append((self._next_id, frame))
+            self._next_id += 1
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(frame)
+            except queue.Full:
+                self.unsubscribe(q)
+                try:
+                    q.get_nowait()  # make room for the close marker
+                    q.put_nowait(None)
+                except (queue.Empty, queue.Full):
+                    pass  # the stream also ends at its next keepalive
+
+    def subscribe(self, last_event_id=None):
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            if last_event_id is not None:
+                missed = [frame for event_id, frame in self._recent if event_id > last_event_id]
+                for frame in missed[-self.queue_size:]: q.put_nowait(frame)
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def stream(self, last_event_id=None, keepalive=KEEPALIVE_SECONDS):
+        # Generator of SSE bytes for one client; the server closes it when the client disconnects.
+        q = self.subscribe(last_event_id)
+        try:
+            yield f'retry: {RETRY_MS}\n\n'.encode('utf-8')
+            while True:
+                try:
+                    frame = q.get(timeout=keepalive)
+                except queue.Empty:
+                    with self._lock:
+                        if q not in self._subscribers: return
+                    yield b': keepalive\n\n'
+                    continue
+                if frame is None: return
+                yield frame
+        finally:
+            self.unsubscribe(q)
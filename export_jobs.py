@@ -0,0 +1,142 @@
+# =============================================================================
+# BACKGROUND EXPORT JOBS
+# Exports run on a small thread pool and are written to a spool directory, so a request only
+# queues the work and the browser polls for progress. A job's id is a hash of what it exports
+# (format, filters, and the log's max id / row count at submit time): re-exporting unchanged
+# data finds the finished file and returns at once, and identical requests share one job.
+# Status lives in memory for jobs this process runs and in a small .json next to the file,
+# so any worker can answer a poll or serve the download.
+# =============================================================================
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import exports
+
+EXPORT_WORKERS = int(os.environ.get('CAWIRE_EXPORT_WORKERS', 2))
+SPOOL_TTL = 24 * 3600       # finished files are kept this long after their last use
+PROGRESS_EVERY = 5000       # rows between status-file updates
+JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+def job_key(fmt, filters, version):
+    payload = json.dumps({'format': fmt, 'filters': dict(sorted(filters.items())), 'version': version})
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+class ExportJob:
+    def __init__(self, key, fmt, filters, total):
+        self.key = key
+        self.format = fmt
+        self.filters = filters
+        self.status = 'queued'
+        self.rows_total = total
+        self.rows_done = 0
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+
+    def to_dict(self):
+        return {'job_id': self.key, 'format': self.format, 'filters': self.filters, 'status': self.status,
+                'rows_done': self.rows_done, 'rows_total': self.rows_total, 'error': self.error,
+                'progress': round(self.rows_done / self.rows_total, 3) if self.rows_total else 1.0,
+                'seconds': round((self.finished or time.time()) - self.started, 3)}
+
+
+class ExportSpool:
+    def __init__(self, spool_dir, workers=EXPORT_WORKERS, ttl=SPOOL_TTL):
+        self.spool_dir = spool_dir
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='export')
+        os.makedirs(spool_dir, exist_ok=True)
+
+    def file_path(self, key, fmt):
+        return os.path.join(self.spool_dir, f'{key}.{fmt}')
+
+    def _status_path(self, key):
+        return os.path.join(self.spool_dir, f'{key}.json')
+
+    def _save_status(self, job):
+        tmp = f'{self._status_path(job.key)}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(job.to_dict(), f)
+        os.replace(tmp, self._status_path(job.key))
+
+    def _load_status(self, key):
+        try:
+            with open(self._status_path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, key):
+        with self._lock:
+            job = self._jobs.get(key)
+        return job.to_dict() if job else self._load_status(key)
+
+    def submit(self, key, fmt, filters, total, header, make_rows):
+        # make_rows() is called on the pool thread and must return the row iterator.
+        path = self.file_path(key, fmt)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job and job.status in ('queued', 'running'): return job.to_dict()
+            if os.path.exists(path):
+                for p in (path, self._status_path(key)):
+                    if os.path.exists(p): os.utime(p)  # keep a file that is still being asked for
+                cached = self._load_status(key)
+                if cached and cached.get('status') == 'done': return dict(cached, cached=True)
+            job = self._jobs[key] = ExportJob(key, fmt, filters, total)
+        self._save_status(job)
+        self._pool.submit(self._run, job, path, header, make_rows)
+        self.evict_expired()
+        return job.to_dict()
+
+    def _run(self, job, path, header, make_rows):
+        job.status = 'running'
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+        def counted(rows):
+            for row in rows:
+                job.rows_done += 1
+                if job.rows_done % PROGRESS_EVERY == 0: self._save_status(job)
+                yield row
+
+        try:
+            writer = exports.FORMATS[job.format][0]
+            with open(tmp, 'wb') as out:
+                writer(header, counted(make_rows()), out)
+            os.replace(tmp, path)
+            job.status = 'done'
+        except Exception as e:
+            job.status, job.error = 'failed', str(e)
+            if os.path.exists(tmp): os.remove(tmp)
+        job.finished = time.time()
+        self._save_status(job)
+        with self._lock:
+            self._jobs.pop(job.key, None)
+
+    def evict_expired(self):
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.spool_dir):
+            path = os.path.join(self.spool_dir, name)
+            try:
+                if os.stat(path).st_mtime < cutoff: os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        # Drop finished files, e.g. after the log was cleared and ids may be reused.
+        with self._lock:
+            running = set(self._jobs)
+        for name in os.listdir(self.spool_dir):
+            if name.split('.', 1)[0] in running: continue
+            try:
+                os.remove(os.path.join(self.spool_dir, name))
+            except OSError:
+                pass
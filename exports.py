@@ -0,0 +1,48 @@
+# =============================================================================
+# EXPORT WRITERS
+# Write InjectionLog rows as .xlsx or .csv. Rows arrive as an iterable (typically a
+# chunked DB reader) and are written as they come, so memory stays flat however long
+# the log is. openpyxl is imported on first export so app workers don't load it at boot.
+# =============================================================================
+import csv
+import io
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CSV_FLUSH_ROWS = 1000
+
+
+def write_xlsx(header, rows, out):
+    from openpyxl import Workbook
+
+    # write_only streams rows into the sheet XML instead of building a cell object per value
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Sheet1')
+    ws.append(header)
+    for row in rows:
+        ws.append(row)
+    wb.save(out)
+
+
+def iter_csv(header, rows):
+    # Yields encoded CSV in blocks of CSV_FLUSH_ROWS rows, for streaming responses.
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % CSV_FLUSH_ROWS == 0:
+            yield buf.getvalue().encode('utf-8')
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue().encode('utf-8')
+
+
+def write_csv(header, rows, out):
+    for block in iter_csv(header, rows):
+        out.write(block)
+
+
+FORMATS = {
+    'xlsx': (write_xlsx, XLSX_MIMETYPE),
+    'csv': (write_csv, 'text/csv'),
+}
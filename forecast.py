@@ -0,0 +1,74 @@
+# =============================================================================
+# COIL DEPLETION FORECAST
+# Estimates heats remaining and time-to-empty for a coil from its last FORECAST_WINDOW
+# injections. The window is seeded from InjectionLog once per coil, then confirm_injection
+# pushes each new heat in with record() - a deque append and a running sum, no history query.
+# Windows remember the coil's heats_treated; if another worker process injected in between,
+# the counts disagree and the window is reseeded on next read.
+# =============================================================================
+import threading
+from collections import deque
+from datetime import timedelta
+
+FORECAST_WINDOW = 20  # heats
+
+
+class CoilForecast:
+    def __init__(self, heats_treated, recent):
+        # recent: [(timestamp, calculated_length)], oldest first
+        self.window = deque(maxlen=FORECAST_WINDOW)
+        self.total = 0.0
+        for ts, length in recent: self._push(ts, length)
+        self.heats_treated = heats_treated
+
+    def _push(self, ts, length):
+        if len(self.window) == self.window.maxlen: self.total -= self.window[0][1]
+        self.window.append((ts, length))
+        self.total += length
+
+    def record(self, ts, length):
+        self._push(ts, length)
+        self.heats_treated += 1
+
+    def snapshot(self, current_length):
+        n = len(self.window)
+        result = {'window_heats': n, 'metres_per_heat': None, 'heats_remaining': None,
+                  'minutes_per_heat': None, 'minutes_to_empty': None, 'empty_at': None}
+        if not n or self.total <= 0: return result
+        per_heat = self.total / n
+        heats_left = max(current_length, 0.0) / per_heat
+        result.update(metres_per_heat=round(per_heat, 1), heats_remaining=round(heats_left, 1))
+        if n < 2: return result
+        interval = (self.window[-1][0] - self.window[0][0]).total_seconds() / (n - 1)
+        if interval <= 0: return result
+        seconds_left = heats_left * interval
+        result.update(minutes_per_heat=round(interval / 60, 1), minutes_to_empty=round(seconds_left / 60),
+                      empty_at=(self.window[-1][0] + timedelta(seconds=seconds_left)).isoformat(timespec='minutes'))
+        return result
+
+
+_forecasts = {}  # coil id -> CoilForecast
+_forecasts_lock = threading.Lock()
+
+
+def get_forecast(coil, load_recent):
+    # load_recent(coil_number, limit) -> [(timestamp, calculated_length)], oldest first
+    with _forecasts_lock:
+        fc = _forecasts.get(coil.id)
+        if fc is None or fc.heats_treated != coil.heats_treated:
+            fc = _forecasts[coil.id] = CoilForecast(coil.heats_treated, load_recent(coil.coil_number, FORECAST_WINDOW))
+        return fc
+
+
+def record(coil_id, heats_treated, ts, length):
+    # heats_treated is the coil's count after this injection; anything else means we missed one
+    with _forecasts_lock:
+        fc = _forecasts.get(coil_id)
+        if fc is None: return
+        if heats_treated is not None and fc.heats_treated == heats_treated - 1: fc.record(ts, length)
+        else: del _forecasts[coil_id]
+
+
+def invalidate():
+    with _forecasts_lock:
+        _forecasts.clear()
@@ -0,0 +1,214 @@
+# =============================================================================
+# METRICS
+# Counters and fixed-bucket histograms kept in process memory and rendered in the Prometheus
+# text format by /metrics. install() hooks the app for per-request numbers: latency by
+# endpoint, DB queries and DB time per request, template render time. span() times a named
+# block inside a route (calc, load_user, ...).
+# CAWIRE_METRICS=0 switches it all off: install() hooks nothing and span() hands back one
+# shared no-op context manager, so the hot paths pay nothing but that call.
+# Numbers are per process; each worker reports its own.
+# =============================================================================
+import bisect
+import contextlib
+import os
+import threading
+import time
+
+ENABLED = os.environ.get('CAWIRE_METRICS', '1') != '0'
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+_NOOP = contextlib.nullcontext()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot: above the largest bucket
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def samples(self, name, labels):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        running = 0
+        for bound, n in zip(self.buckets + ('+Inf',), counts):
+            running += n
+            yield f'{name}_bucket', dict(labels, le=str(bound)), running
+        yield f'{name}_sum', labels, total
+        yield f'{name}_count', labels, count
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labels):
+        yield f'{name}_total', labels, self.value
+
+
+class Family:
+    # one metric name with its label names; a child per distinct label values
+    def __init__(self, name, help_text, kind, labelnames, buckets=None):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = Histogram(self.buckets) if self.kind == 'histogram' else Counter()
+                    self._children[values] = child
+        return child
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} {self.kind}'
+        with self._lock:
+            children = sorted(self._children.items())
+        for values, child in children:
+            for sample, labels, value in child.samples(self.name, dict(zip(self.labelnames, values))):
+                yield f'{sample}{_format_labels(labels)} {_format_value(value)}'
+
+
+_families = []
+_gauges = []  # (name, help, fn)
+
+
+def histogram(name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+    family = Family(name, help_text, 'histogram', labelnames, buckets)
+    _families.append(family)
+    return family
+
+
+def counter(name, help_text, labelnames=()):
+    family = Family(name, help_text, 'counter', labelnames)
+    _families.append(family)
+    return family
+
+
+def gauge(name, help_text, fn):
+    # read when /metrics is scraped
+    _gauges.append((name, help_text, fn))
+
+
+def _format_labels(labels):
+    if not labels: return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in labels.values())
+    return '{' + ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    lines = []
+    for family in _families: lines.extend(family.render())
+    for name, help_text, fn in _gauges:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {_format_value(fn())}']
+    return '\n'.join(lines) + '\n'
+
+
+# --- BUILT-IN METRICS ---
+REQUEST_SECONDS = histogram('cawire_http_request_duration_seconds',
+                            'Time from routing to response, by endpoint (streamed bodies not included).',
+                            ('endpoint', 'method'))
+REQUESTS = counter('cawire_http_requests', 'Responses by endpoint and status code.', ('endpoint', 'status'))
+REQUEST_QUERIES = histogram('cawire_db_queries_per_request', 'SQL statements executed per request.',
+                            ('endpoint',), QUERY_COUNT_BUCKETS)
+REQUEST_DB_SECONDS = histogram('cawire_db_seconds_per_request', 'Time spent in SQL statements per request.',
+                               ('endpoint',))
+QUERY_SECONDS = histogram('cawire_db_query_duration_seconds', 'Duration of each SQL statement, any thread.')
+TEMPLATE_SECONDS = histogram('cawire_template_render_seconds', 'Jinja render time by template.', ('template',))
+SPAN_SECONDS = histogram('cawire_span_duration_seconds', 'Timed blocks inside requests.', ('span',))
+
+_request = threading.local()  # per-request query tally, set between before_request and after_request
+
+
+class _Span:
+    __slots__ = ('child', 'started')
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started)
+
+
+def span(name):
+    if not ENABLED: return _NOOP
+    return _Span(SPAN_SECONDS.labels(name))
+
+
+def install(app, engine_class):
+    # Hooks the request / query / template timers; a no-op when metrics are disabled.
+    if not ENABLED: return
+    from flask import before_render_template, request, template_rendered
+    from sqlalchemy import event
+
+    # The start time rides on the statement's execution context, not a per-connection stack: a
+    # statement that fails never reaches after_cursor_execute, and its context is simply dropped.
+    @event.listens_for(engine_class, 'before_cursor_execute')
+    def _query_started(conn, cursor, statement, parameters, context, executemany):
+        if context is not None: context.metrics_started = time.perf_counter()
+
+    @event.listens_for(engine_class, 'after_cursor_execute')
+    def _query_finished(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, 'metrics_started', None)
+        if started is None: return
+        elapsed = time.perf_counter() - started
+        QUERY_SECONDS.labels().observe(elapsed)
+        if getattr(_request, 'active', False):
+            _request.queries += 1
+            _request.db_seconds += elapsed
+
+    def _render_started(sender, template, context, **extra):
+        _request.__dict__.setdefault('templates', []).append(time.perf_counter())
+
+    def _render_finished(sender, template, context, **extra):
+        started = _request.__dict__.get('templates')
+        if started: TEMPLATE_SECONDS.labels(template.name or '?').observe(time.perf_counter() - started.pop())
+
+    before_render_template.connect(_render_started, app, weak=False)
+    template_rendered.connect(_render_finished, app, weak=False)
+
+    @app.before_request
+    def _start_request_metrics():
+        _request.active, _request.queries, _request.db_seconds = True, 0, 0.0
+        _request.started = time.perf_counter()
+
+    @app.after_request
+    def _record_request_metrics(response):
+        if not getattr(_request, 'active', False): return response
+        _request.active = False
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_SECONDS.labels(endpoint, request.method).observe(time.perf_counter() - _request.started)
+        REQUESTS.labels(endpoint, str(response.status_code)).inc()
+        REQUEST_QUERIES.labels(endpoint).observe(_request.queries)
+        REQUEST_DB_SECONDS.labels(endpoint).observe(_request.db_seconds)
+        return response
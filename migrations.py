@@ -0,0 +1,163 @@
+# =============================================================================
+# SCHEMA MIGRATIONS & LEGACY IMPORT
+# upgrade_schema() brings the live database up to the current models in place.
+# import_legacy() pulls users, coils and injection logs out of the old production_vN.db
+# files (one per historical schema) with ATTACH + INSERT ... SELECT, so the copy runs
+# inside SQLite instead of row by row through the ORM.
+# =============================================================================
+import os
+import re
+import time
+
+import subscriptions
+
+def backfill_confirm_keys(cur):
+    # Keys the first log of each (LF, heat) the way confirm_injection does ('<lf>/<heat_id>').
+    # Older duplicates of a pair keep a NULL key, so the unique index can still be built; pairs
+    # that already have a keyed log (e.g. before a legacy import) are left alone.
+    cur.execute("UPDATE injection_log SET confirm_key = TRIM(COALESCE(lf_number, '')) || '/' || TRIM(heat_id) "
+                "WHERE id IN (SELECT MIN(id) FROM injection_log WHERE TRIM(COALESCE(heat_id, '')) != '' "
+                "GROUP BY TRIM(COALESCE(lf_number, '')), TRIM(heat_id) HAVING COUNT(confirm_key) = 0)")
+    return cur.rowcount
+
+
+# One-off data migrations for changes that "add missing columns / indexes" can't express.
+# Each runs once, in order; PRAGMA user_version stores the last version applied.
+DATA_MIGRATIONS = [  # (version, description, fn(dbapi_cursor))
+    (1, 'backfill user.subscription_status', subscriptions.backfill_status),
+    (2, 'key existing injection logs for idempotent confirmation', backfill_confirm_keys),
+]
+
+# Legacy schema generations, newest first: (version, table, column that first appeared in it)
+LEGACY_SCHEMAS = (
+    (6, 'user', 'submitted_utr'),             # v29-v30: manual UTR approval
+    (5, 'user', 'subscription_expiry'),       # v24-v28: subscriptions
+    (4, 'user', 'role'),                      # v17-v23: logins
+    (3, 'injection_log', 'heat_id'),          # v16: heat / LF on each log
+    (2, 'coil_config', 'coil_number'),        # v9-v12: named coils
+    (1, 'injection_log', 'calculated_length'),  # production_data.db: first release
+)
+
+
+# --- LIVE SCHEMA UPGRADE ---
+def _table_columns(cur, table, schema='main'):
+    return [row[1] for row in cur.execute(f'PRAGMA {schema}.table_info("{table}")')]
+
+
+def _add_missing_columns(cur, metadata, dialect):
+    # create_all() never alters existing tables; add new model columns with ALTER TABLE.
+    added = []
+    for table in metadata.sorted_tables:
+        existing = set(_table_columns(cur, table.name))
+        for column in table.columns:
+            if column.name in existing: continue
+            ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column.type.compile(dialect)}'
+            if column.server_default is not None:
+                default = column.server_default.arg
+                if isinstance(default, str): default = "'" + default.replace("'", "''") + "'"
+                ddl += f' DEFAULT {default}'
+            cur.execute(ddl)
+            added.append(f'{table.name}.{column.name}')
+    return added
+
+
+def upgrade_schema(db):
+    db.create_all()
+    raw = db.engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        added = _add_missing_columns(cur, db.metadata, db.engine.dialect)
+        raw.commit()
+        current = cur.execute('PRAGMA user_version').fetchone()[0]
+        applied = []
+        for version, description, migrate in DATA_MIGRATIONS:
+            if version <= current: continue
+            migrate(cur)
+            cur.execute(f'PRAGMA user_version = {int(version)}')
+            raw.commit()
+            applied.append(f'{version}: {description}')
+    finally:
+        raw.close()
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes: index.create(db.engine, checkfirst=True)
+    return {'columns_added': added, 'migrations_applied': applied}
+
+
+# --- LEGACY IMPORT ---
+def detect_legacy_version(cur, schema='legacy'):
+    for version, table, column in LEGACY_SCHEMAS:
+        if column in _table_columns(cur, table, schema): return version
+    return None
+
+
+def _copy_table(cur, table, required, dedupe_sql=None, overrides=None):
+    overrides = overrides or {}
+    source = set(_table_columns(cur, table, 'legacy'))
+    if not source or not set(required) <= source: return 0
+    columns = [c for c in _table_columns(cur, table) if c != 'id' and (c in source or c in overrides)]
+    target_cols = ', '.join(f'"{c}"' for c in columns)
+    select_cols = ', '.join(overrides.get(c, f's."{c}"') for c in columns)
+    where = [f's."{c}" IS NOT NULL' for c in required]
+    if dedupe_sql:
+        heat_id = 's."heat_id"' if 'heat_id' in source else 'NULL'
+        where.append(f'NOT EXISTS ({dedupe_sql.format(heat_id=heat_id)})')
+    cur.execute(f'INSERT OR IGNORE INTO main."{table}" ({target_cols}) SELECT {select_cols} '
+                f'FROM legacy."{table}" s WHERE {" AND ".join(where)} ORDER BY s.id')
+    return cur.rowcount
+
+
+def import_legacy_file(engine, path, keep_admin_roles=False):
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute('ATTACH DATABASE ? AS legacy', (path,))
+        try:
+            version = detect_legacy_version(cur)
+            if version is None: return {'file': path, 'version': None, 'error': 'not a Ca-wire database'}
+            counts = {
+                # usernames are UNIQUE, so OR IGNORE keeps the account already in the live DB;
+                # old admin accounts are demoted unless asked, so an import can't grant admin access
+                'users': _copy_table(cur, 'user', ('username',), overrides=None if keep_admin_roles else {
+                    'role': "CASE WHEN s.role = 'admin' THEN 'operator' ELSE s.role END"}),
+                # legacy coils come in inactive; the live active coil stays as it is
+                'coils': _copy_table(cur, 'coil_config', ('coil_number',),
+                                     'SELECT 1 FROM main.coil_config m WHERE m.coil_number = s.coil_number',
+                                     overrides={'is_active': '0'}),
+                # a heat is the same heat if heat_id and timestamp match (timestamp index drives it)
+                'logs': _copy_table(cur, 'injection_log', ('timestamp', 'calculated_length'),
+                                    'SELECT 1 FROM main.injection_log m '
+                                    'WHERE m.timestamp = s.timestamp AND m.heat_id IS {heat_id}'),
+            }
+            # so confirming an imported heat again is answered as a replay, not logged twice
+            backfill_confirm_keys(cur)
+            raw.commit()
+        except Exception:
+            raw.rollback()
+            raise
+        finally:
+            cur.execute('DETACH DATABASE legacy')
+    finally:
+        raw.close()
+    return {'file': path, 'version': version, **counts}
+
+
+def _legacy_sort_key(path):
+    # newest generation first, so the most recent copy of a user or coil is the one kept
+    match = re.search(r'_v(\d+)', os.path.basename(path))
+    return int(match.group(1)) if match else 0
+
+
+def import_legacy(engine, paths, target_path=None, keep_admin_roles=False):
+    reports = []
+    for path in sorted(paths, key=_legacy_sort_key, reverse=True):
+        if not os.path.isfile(path):
+            reports.append({'file': path, 'version': None, 'error': 'no such file'})
+            continue
+        if target_path and os.path.exists(target_path) and os.path.samefile(path, target_path):
+            reports.append({'file': path, 'version': None, 'error': 'skipped: live database'})
+            continue
+        t0 = time.perf_counter()
+        report = import_legacy_file(engine, path, keep_admin_roles)
+        report['seconds'] = round(time.perf_counter() - t0, 3)
+        reports.append(report)
+    return reports
@@ -0,0 +1,64 @@
+# =============================================================================
+# PAYMENT QR STORE
+# Uploaded QR images are decoded, checked, flattened and shrunk to at most QR_MAX_SIDE px,
+# then saved as PNG under their SHA-256. The file name is the content, so a URL built from the
+# digest never changes meaning: it can be cached forever and used directly as a strong ETag.
+# Pillow is imported on first upload so app workers don't load it at boot.
+# =============================================================================
+import hashlib
+import io
+import os
+import re
+
+QR_MAX_BYTES = 5 * 1024 * 1024
+QR_MAX_SIDE = 800
+QR_MAX_PIXELS = 40_000_000  # refuse to decode anything bigger (decompression bombs)
+ACCEPTED_FORMATS = ('PNG', 'JPEG', 'GIF', 'WEBP', 'BMP')
+DIGEST = re.compile(r'^[0-9a-f]{64}$')
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def normalize(data):
+    from PIL import Image, ImageOps
+
+    if not data: raise InvalidImage('empty file')
+    if len(data) > QR_MAX_BYTES: raise InvalidImage(f'file is larger than {QR_MAX_BYTES // (1024 * 1024)} MB')
+    try:
+        img = Image.open(io.BytesIO(data))
+        if img.format not in ACCEPTED_FORMATS: raise InvalidImage(f"unsupported image type {img.format or '?'}")
+        if img.width * img.height > QR_MAX_PIXELS: raise InvalidImage('image dimensions are too large')
+        img.load()
+    except (OSError, Image.DecompressionBombError):
+        raise InvalidImage('not a readable image') from None
+    img = ImageOps.exif_transpose(img)
+    if img.mode in ('RGBA', 'LA', 'P', 'PA'):
+        # transparent areas of a QR must scan as white, not black
+        img = img.convert('RGBA')
+        flat = Image.new('RGB', img.size, 'white')
+        flat.paste(img, mask=img.getchannel('A'))
+        img = flat
+    elif img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    img.thumbnail((QR_MAX_SIDE, QR_MAX_SIDE), Image.Resampling.LANCZOS)
+    out = io.BytesIO()
+    img.save(out, 'PNG', optimize=True)
+    return out.getvalue()
+
+
+def path_for(folder, digest):
+    return os.path.join(folder, f'{digest}.png')
+
+
+def store(png, folder):
+    digest = hashlib.sha256(png).hexdigest()
+    path = path_for(folder, digest)
+    if not os.path.exists(path):
+        os.makedirs(folder, exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(png)
+        os.replace(tmp, path)
+    return digest
@@ -0,0 +1,62 @@
+# =============================================================================
+# SQLITE STORAGE SETTINGS
+# Per-connection PRAGMAs and pool sizing for the app's SQLite engine. Defaults suit a
+# multi-threaded server writing from several LFs; override them through the environment:
+#   CAWIRE_SQLITE_TUNING=0                          plain SQLite defaults (no PRAGMAs)
+#   CAWIRE_SQLITE_PRAGMAS="cache_size=-64000,mmap_size=0"  override / add individual PRAGMAs
+#   CAWIRE_DB_POOL_SIZE, CAWIRE_DB_MAX_OVERFLOW     connection pool bounds
+# =============================================================================
+import os
+import re
+
+from sqlalchemy import event
+
+# journal_mode must come first: mmap and synchronous behave differently under WAL
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',      # readers no longer block behind confirm_injection writes
+    'synchronous': 'NORMAL',    # with WAL: fsync at checkpoint, not on every commit
+    'busy_timeout': 5000,       # ms to wait for the write lock before "database is locked"
+    'cache_size': -16000,       # negative = KiB, i.e. 16 MB page cache per connection
+    'mmap_size': 268435456,     # 256 MB of the file read through the page cache mapping
+    'temp_store': 'MEMORY',     # sort / temp b-trees for ORDER BY and indexes stay in RAM
+}
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_OVERFLOW = 20
+
+_PRAGMA_NAME = re.compile(r'^[a-z_]+$')
+_PRAGMA_VALUE = re.compile(r'^-?[A-Za-z0-9_]+$')
+
+
+def pragmas_from_env(environ=os.environ):
+    if environ.get('CAWIRE_SQLITE_TUNING', '1') == '0': return {}
+    pragmas = dict(DEFAULT_PRAGMAS)
+    for item in environ.get('CAWIRE_SQLITE_PRAGMAS', '').split(','):
+        if not item.strip(): continue
+        name, _, value = item.partition('=')
+        name, value = name.strip().lower(), value.strip()
+        if not (_PRAGMA_NAME.match(name) and _PRAGMA_VALUE.match(value)):
+            raise ValueError(f'invalid CAWIRE_SQLITE_PRAGMAS entry: {item!r}')
+        pragmas[name] = value
+    return pragmas
+
+
+def engine_options(environ=os.environ):
+    # SQLAlchemy uses a QueuePool for file databases; size it for the server's thread count so
+    # requests don't queue for a connection while SQLite itself could serve them.
+    return {
+        'pool_size': int(environ.get('CAWIRE_DB_POOL_SIZE', DEFAULT_POOL_SIZE)),
+        'max_overflow': int(environ.get('CAWIRE_DB_MAX_OVERFLOW', DEFAULT_MAX_OVERFLOW)),
+        'pool_timeout': 30,
+    }
+
+
+def install_pragmas(engine, pragmas):
+    statements = [f'PRAGMA {name}={value}' for name, value in pragmas.items()]
+    if not statements: return
+
+    @event.listens_for(engine, 'connect')
+    def _apply_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        for stmt in statements:
+            cur.execute(stmt)
+        cur.close()
@@ -0,0 +1,81 @@
+# =============================================================================
+# SUBSCRIPTION STATUS
+# User.subscription_status is a materialized copy of "is this account's subscription live":
+#   permanent - admins, never expire        active   - expiry more than EXPIRING_SOON_DAYS away
+#   expiring  - expiry within that window   expired  - no expiry, or expiry in the past
+# Routes that change the expiry write the status with it. Everything else is time passing,
+# which refresh_status() catches up on: a background thread runs it every REFRESH_INTERVAL
+# seconds in each app process (CAWIRE_STATUS_INTERVAL=0 turns that off, e.g. when
+# `flask refresh-subscriptions` runs from cron instead).
+# =============================================================================
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+EXPIRING_SOON_DAYS = 7
+REFRESH_INTERVAL = int(os.environ.get('CAWIRE_STATUS_INTERVAL', 60))
+STATUSES = ('active', 'expiring', 'expired', 'permanent')
+LIVE_STATUSES = ('active', 'expiring', 'permanent')
+
+log = logging.getLogger(__name__)
+
+
+def status_for(role, expiry, now=None):
+    now = now or datetime.now()
+    if role == 'admin': return 'permanent'
+    if not expiry or expiry < now: return 'expired'
+    return 'expiring' if expiry < now + timedelta(days=EXPIRING_SOON_DAYS) else 'active'
+
+
+def _ts(dt):
+    # the text format SQLAlchemy stores DateTime in on SQLite, so string comparison orders correctly
+    return dt.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def backfill_status(cur, now=None):
+    # Full recompute: one pass over the table. Used by the schema migration and `--full`.
+    now = now or datetime.now()
+    cur.execute("UPDATE user SET subscription_status = CASE "
+                "WHEN COALESCE(role, 'operator') = 'admin' THEN 'permanent' "
+                "WHEN subscription_expiry IS NULL OR subscription_expiry < ? THEN 'expired' "
+                "WHEN subscription_expiry < ? THEN 'expiring' ELSE 'active' END",
+                (_ts(now), _ts(now + timedelta(days=EXPIRING_SOON_DAYS))))
+    return cur.rowcount
+
+
+def refresh_status(cur, now=None):
+    # Only the two transitions time can cause. Each is a range scan of
+    # ix_user_subscription_status on (status, expiry), touching just the rows that change.
+    now = now or datetime.now()
+    changed = cur.execute("UPDATE user SET subscription_status = 'expired' "
+                          "WHERE subscription_status IN ('active', 'expiring') AND subscription_expiry < ? "
+                          "RETURNING id", (_ts(now),)).fetchall()
+    changed += cur.execute("UPDATE user SET subscription_status = 'expiring' "
+                           "WHERE subscription_status = 'active' AND subscription_expiry < ? RETURNING id",
+                           (_ts(now + timedelta(days=EXPIRING_SOON_DAYS)),)).fetchall()
+    return [row[0] for row in changed]
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def start_scheduler(job, interval=REFRESH_INTERVAL):
+    # One daemon thread per process; safe to call on every request.
+    global _scheduler
+    if _scheduler is not None or interval <= 0: return
+    with _scheduler_lock:
+        if _scheduler is not None: return
+
+        def run():
+            while True:
+                try:
+                    job()
+                except Exception:
+                    log.exception('subscription status refresh failed')
+                time.sleep(interval)
+
+        _scheduler = threading.Thread(target=run, name='subscription-status', daemon=True)
+        _scheduler.start()